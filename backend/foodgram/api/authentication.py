@@ -0,0 +1,120 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from recipes.models import CustomUser
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .cache import create_cache
+
+user_tokens_cache = create_cache("user_tokens")
+
+
+class TokenCache:
+    """Кэш «токен → пользователь», сверяемый с поколением пользователя."""
+
+    def __init__(self, size, ttl, alias=None):
+        self.size = size
+        self.ttl = ttl
+        self.alias = alias
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get_shared_key(self, key):
+        return f"tokens:{hashlib.sha256(key.encode()).hexdigest()}"
+
+    def get_generation(self, user_id):
+        return user_tokens_cache.get_generation(user_id)
+
+    def get(self, key):
+        entry = self.get_local(key)
+        if entry is None and self.alias is not None:
+            entry = caches[self.alias].get(self.get_shared_key(key))
+            if entry is not None:
+                self.remember(key, *entry)
+        if entry is None:
+            return None
+        user, token, generation = entry
+        if generation != self.get_generation(user.id):
+            with self.lock:
+                self.entries.pop(key, None)
+            return None
+        return copy.copy(user), token
+
+    def get_local(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, *entry = entry
+            if expires > time.monotonic():
+                self.entries.move_to_end(key)
+                return entry
+            del self.entries[key]
+            return None
+
+    def remember(self, key, user, token, generation):
+        with self.lock:
+            self.entries[key] = (
+                time.monotonic() + self.ttl,
+                user,
+                token,
+                generation,
+            )
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def set(self, key, user, token, generation):
+        self.remember(key, copy.copy(user), token, generation)
+        if self.alias is not None:
+            caches[self.alias].set(
+                self.get_shared_key(key), (user, token, generation), self.ttl
+            )
+
+
+token_cache = TokenCache(
+    settings.TOKEN_CACHE_SIZE,
+    settings.TOKEN_CACHE_TTL,
+    settings.TOKEN_CACHE_ALIAS,
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к базе на каждый запрос."""
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+        started = time.time_ns()
+        user, token = super().authenticate_credentials(key)
+        generation = token_cache.get_generation(user.id)
+        # Поколение — время изменения; если оно сдвинулось во время
+        # чтения из базы, прочитанный пользователь мог устареть.
+        if generation < started:
+            token_cache.set(key, user, token, generation)
+        return user, token
+
+
+def bump_user_tokens(user_id):
+    transaction.on_commit(lambda: user_tokens_cache.bump(user_id))
+
+
+def invalidate_token(instance, **kwargs):
+    bump_user_tokens(instance.user_id)
+
+
+def invalidate_user_tokens(instance, **kwargs):
+    bump_user_tokens(instance.id)
+
+
+post_delete.connect(invalidate_token, sender=Token)
+post_save.connect(invalidate_user_tokens, sender=CustomUser)
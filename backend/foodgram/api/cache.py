@@ -0,0 +1,198 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Subscription, Tag, TagRecipe)
+from rest_framework.response import Response
+
+from .metrics import registry
+
+COUNTERS_SCOPE = "counters"
+
+
+def get_request_signature(request):
+    params = sorted(
+        (key, sorted(values)) for key, values in request.query_params.lists()
+    )
+    # В данных ответа абсолютные ссылки, поэтому учитываются хост и схема.
+    return f"{request.scheme}://{request.get_host()}{request.path}?{params}"
+
+
+class ResponseCache:
+    """Кэш ответов, ключи которого включают поколение данных."""
+
+    def __init__(self, prefix, alias, timeout):
+        self.prefix = prefix
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get_generation_key(self, scope=""):
+        return f"{self.prefix}:generation:{scope}"
+
+    def get_generation(self, scope=""):
+        key = self.get_generation_key(scope)
+        generation = self.cache.get(key)
+        if generation is None:
+            generation = time.time_ns()
+            if not self.cache.add(key, generation, None):
+                generation = self.cache.get(key, generation)
+        return generation
+
+    def bump(self, scope=""):
+        self.cache.set(self.get_generation_key(scope), time.time_ns(), None)
+
+    def bump_on_commit(self, scope="", **kwargs):
+        transaction.on_commit(lambda: self.bump(scope))
+
+    def watch(self, *models):
+        for model in models:
+            post_save.connect(self.bump_on_commit, sender=model, weak=False)
+            post_delete.connect(
+                self.bump_on_commit, sender=model, weak=False
+            )
+
+    def get_key(self, request, scopes=("",)):
+        digest = hashlib.sha256(
+            get_request_signature(request).encode()
+        ).hexdigest()
+        generations = ":".join(
+            str(self.get_generation(scope)) for scope in scopes
+        )
+        return f"{self.prefix}:{generations}:{digest}"
+
+    def get(self, key):
+        data = self.cache.get(key)
+        registry.inc(
+            "api_response_cache_total",
+            (
+                ("cache", self.prefix),
+                ("result", "hit" if data is not None else "miss"),
+            ),
+        )
+        return data
+
+    def set(self, key, data):
+        self.cache.set(key, data, self.timeout)
+
+
+def create_cache(prefix, *models):
+    response_cache = ResponseCache(
+        prefix, settings.RESPONSE_CACHE_ALIAS, settings.RESPONSE_CACHE_TIMEOUT
+    )
+    response_cache.watch(*models)
+    return response_cache
+
+
+recipe_cache = create_cache(
+    "recipes", Recipe, IngredientRecipe, TagRecipe, Tag, Ingredient
+)
+m2m_changed.connect(
+    recipe_cache.bump_on_commit, sender=Recipe.tags.through, weak=False
+)
+tag_cache = create_cache("tags", Tag)
+ingredient_cache = create_cache("ingredients", Ingredient)
+pantry_cache = create_cache("pantry", Recipe, IngredientRecipe)
+user_flags_cache = create_cache("user_flags")
+
+
+def bump_user_flags(instance, **kwargs):
+    transaction.on_commit(lambda: user_flags_cache.bump(instance.user_id))
+
+
+for model in (Favorite, ShoppingCart, Subscription):
+    post_save.connect(bump_user_flags, sender=model, weak=False)
+    post_delete.connect(bump_user_flags, sender=model, weak=False)
+
+
+class CacheScopesMixin:
+    def get_cache_scopes(self, request):
+        """Области поколений, от которых зависит ответ."""
+        return ("",)
+
+
+class ConditionalGetMixin(CacheScopesMixin):
+    """ETag по поколениям данных, без запросов к базе.
+
+    Last-Modified не отдаётся: с точностью до секунды он пропускал бы
+    изменения, сделанные в одну секунду.
+    """
+
+    etag_cache = None
+    etag_per_user = False
+
+    def get_etag(self, request):
+        generations = [
+            self.etag_cache.get_generation(scope)
+            for scope in self.get_cache_scopes(request)
+        ]
+        user = request.user
+        if self.etag_per_user and not user.is_anonymous:
+            generations.append(user_flags_cache.get_generation(user.id))
+        else:
+            user = None
+        signature = get_request_signature(request)
+        return hashlib.sha256(
+            f"{signature}:{user and user.id}:{generations}".encode()
+        ).hexdigest()
+
+    def get_conditional_response(self, request, handler, *args, **kwargs):
+        etag = quote_etag(self.get_etag(request))
+        response = get_conditional_response(request._request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            request, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            request, super().retrieve, *args, **kwargs
+        )
+
+
+class AnonymousCacheMixin(CacheScopesMixin):
+    """Отдаёт анонимным пользователям list и retrieve из кэша."""
+
+    response_cache = recipe_cache
+
+    def get_cached_response(self, request, handler, *args, **kwargs):
+        if not request.user.is_anonymous:
+            return handler(request, *args, **kwargs)
+        key = self.response_cache.get_key(
+            request, self.get_cache_scopes(request)
+        )
+        data = self.response_cache.get(key)
+        if data is not None:
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            self.response_cache.set(key, response.data)
+        response["X-Cache"] = "MISS"
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            request, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            request, super().retrieve, *args, **kwargs
+        )
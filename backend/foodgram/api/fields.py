@@ -0,0 +1,73 @@
+import base64
+import uuid
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from drf_base64.fields import Base64ImageField
+from recipes.images import get_variants
+from rest_framework import serializers
+
+BASE64_CHUNK_SIZE = 64 * 1024
+
+
+class DecodedImageFile(TemporaryUploadedFile):
+    """Временный файл, close() которого не падает после переноса."""
+
+    def __del__(self):
+        self.close()
+
+
+class StreamingBase64ImageField(Base64ImageField):
+    """Base64-картинка, декодируемая блоками во временный файл."""
+
+    def _decode(self, data):
+        if not (isinstance(data, str) and data.startswith("data:")):
+            return super()._decode(data)
+        header, _, encoded = data.partition(";base64,")
+        if len(encoded) // 4 * 3 > settings.RECIPE_IMAGE_MAX_SIZE:
+            raise serializers.ValidationError(
+                "Размер картинки не должен превышать "
+                f"{settings.RECIPE_IMAGE_MAX_SIZE} байт."
+            )
+        ext = header.split("/")[-1]
+        image = DecodedImageFile(
+            name=f"{uuid.uuid4()}.{ext}",
+            content_type=header[len("data:"):],
+            size=0,
+            charset=None,
+        )
+        try:
+            for start in range(0, len(encoded), BASE64_CHUNK_SIZE):
+                image.write(
+                    base64.b64decode(
+                        encoded[start:start + BASE64_CHUNK_SIZE]
+                    )
+                )
+        except ValueError:
+            image.close()
+            raise serializers.ValidationError("Некорректные данные base64.")
+        image.size = image.tell()
+        image.seek(0)
+        return image
+
+
+class ImageVariantsField(serializers.Field):
+    """Абсолютные ссылки на уменьшенные копии картинки рецепта."""
+
+    def __init__(self, **kwargs):
+        kwargs["source"] = "*"
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        variants = get_variants(recipe)
+        request = self.context.get("request")
+        if request is None:
+            return variants
+        return {
+            width: {
+                extension: request.build_absolute_uri(url)
+                for extension, url in formats.items()
+            }
+            for width, formats in variants.items()
+        }
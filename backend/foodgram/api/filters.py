@@ -1,29 +1,89 @@
+import threading
+
 from django.contrib.auth import get_user_model
+from django.db.models import Count, F
+from django_filters.constants import EMPTY_VALUES
 from django_filters.rest_framework import FilterSet, filters
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Recipe, Tag, TagRecipe
+from recipes.search import search
+
+from .cache import tag_cache
 
 User = get_user_model()
+TAGS_MATCH_ANY = "any"
+TAGS_MATCH_ALL = "all"
 
 
-class IngredientFilter(FilterSet):
-    name = filters.CharFilter(lookup_expr="startswith")
+class TagSlugMap:
+    """Соответствие slug → id тегов по поколению tag_cache."""
 
-    class Meta:
-        model = Ingredient
-        fields = ["name"]
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.generation = None
+        self.ids = {}
+
+    def get_ids(self):
+        generation = tag_cache.get_generation()
+        if self.generation == generation:
+            return self.ids
+        with self.lock:
+            if self.generation != generation:
+                self.ids = dict(Tag.objects.values_list("slug", "id"))
+                self.generation = generation
+            return self.ids
+
+
+tag_slug_map = TagSlugMap()
+
+
+def get_tag_choices():
+    return [(slug, slug) for slug in tag_slug_map.get_ids()]
+
+
+class RecipeOrderingFilter(filters.OrderingFilter):
+    """Сортировка с пустыми значениями в конце и по дате и id."""
+
+    def get_ordering_value(self, param):
+        descending = param.startswith("-")
+        param = param[1:] if descending else param
+        field = F(self.param_map.get(param, param))
+        if descending:
+            return field.desc(nulls_last=True)
+        return field.asc(nulls_last=True)
+
+    def filter(self, queryset, value):
+        if value in EMPTY_VALUES:
+            return queryset
+        return queryset.order_by(
+            *(self.get_ordering_value(param) for param in value),
+            "-pub_date",
+            "-id",
+        )
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name="tags__slug",
-        to_field_name="slug",
-        queryset=Tag.objects.all(),
+    tags = filters.MultipleChoiceFilter(
+        choices=get_tag_choices, method="filter_tags"
+    )
+    tags_match = filters.ChoiceFilter(
+        choices=((TAGS_MATCH_ANY, "any"), (TAGS_MATCH_ALL, "all")),
+        method="filter_tags_match",
     )
 
     is_favorited = filters.BooleanFilter(method="filter_is_favorited")
     is_in_shopping_cart = filters.BooleanFilter(
         method="filter_is_in_shopping_cart"
     )
+    search = filters.CharFilter(method="filter_search")
+    ordering = RecipeOrderingFilter(
+        fields=(
+            ("popularity__score", "popularity"),
+            ("favorites_count", "favorites"),
+            ("cooking_time", "cooking_time"),
+            ("name", "name"),
+            ("pub_date", "pub_date"),
+        )
+    )
 
     class Meta:
         model = Recipe
@@ -32,6 +92,24 @@ class RecipeFilter(FilterSet):
             "tags",
         )
 
+    def filter_tags(self, queryset, name, value):
+        ids = tag_slug_map.get_ids()
+        tag_ids = {ids[slug] for slug in value if slug in ids}
+        recipes = TagRecipe.objects.filter(tag_id__in=tag_ids)
+        if self.form.cleaned_data.get("tags_match") == TAGS_MATCH_ALL:
+            recipes = (
+                recipes.values("recipe_id")
+                .annotate(tags_count=Count("tag_id", distinct=True))
+                .filter(tags_count=len(tag_ids))
+            )
+        return queryset.filter(id__in=recipes.values("recipe_id"))
+
+    def filter_tags_match(self, queryset, name, value):
+        return queryset
+
+    def filter_search(self, queryset, name, value):
+        return search(queryset, value)
+
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
@@ -0,0 +1,56 @@
+import threading
+from bisect import bisect_left
+
+from recipes.models import Ingredient
+
+from .cache import ingredient_cache
+
+
+class IngredientIndex:
+    """Префиксный индекс ингредиентов по поколению ingredient_cache."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.generation = None
+        self.entries = ()
+
+    def get_entries(self):
+        generation = ingredient_cache.get_generation()
+        if self.generation == generation:
+            return self.entries
+        with self.lock:
+            if self.generation != generation:
+                ingredients = Ingredient.objects.values(
+                    "id", "name", "measurement_unit"
+                )
+                self.entries = sorted(
+                    (
+                        (ingredient["name"].casefold(), ingredient["id"]),
+                        ingredient,
+                    )
+                    for ingredient in ingredients
+                )
+                self.generation = generation
+            return self.entries
+
+    def search(self, query, limit=None):
+        entries = self.get_entries()
+        query = query.strip().casefold()
+        if not query:
+            return [ingredient for _, ingredient in reversed(entries)][:limit]
+        start = bisect_left(entries, ((query,),))
+        found = []
+        for (name, _), ingredient in entries[start:]:
+            if not name.startswith(query) or len(found) == limit:
+                break
+            found.append(ingredient)
+        if limit is None or len(found) < limit:
+            for (name, _), ingredient in entries:
+                if query in name and not name.startswith(query):
+                    found.append(ingredient)
+                    if len(found) == limit:
+                        break
+        return found
+
+
+ingredient_index = IngredientIndex()
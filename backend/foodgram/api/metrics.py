@@ -0,0 +1,264 @@
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+HISTOGRAMS = {
+    "api_request_duration_seconds": (
+        "Время обработки запроса.",
+        DURATION_BUCKETS,
+    ),
+    "api_db_queries": ("Количество SQL-запросов.", COUNT_BUCKETS),
+    "api_db_duration_seconds": (
+        "Суммарное время SQL-запросов.",
+        DURATION_BUCKETS,
+    ),
+    "api_serialize_duration_seconds": (
+        "Время сериализации данных ответа.",
+        DURATION_BUCKETS,
+    ),
+    "api_render_duration_seconds": (
+        "Время рендеринга ответа.",
+        DURATION_BUCKETS,
+    ),
+    "api_response_size_bytes": ("Размер тела ответа.", SIZE_BUCKETS),
+}
+COUNTERS = {
+    "api_n_plus_one_total": (
+        "Запросы, в которых один и тот же SQL выполнялся "
+        "API_METRICS_N_PLUS_ONE и более раз."
+    ),
+    "api_response_cache_total": "Попадания и промахи кэша ответов.",
+}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Метрики API в памяти процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = Counter()
+
+    def observe(self, name, labels, value):
+        key = (name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(
+                    HISTOGRAMS[name][1]
+                )
+            histogram.observe(value)
+
+    def inc(self, name, labels):
+        with self.lock:
+            self.counters[(name, labels)] += 1
+
+    def render(self):
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        lines = []
+        for name, (description, _) in HISTOGRAMS.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, labels), histogram in histograms:
+                if metric != name:
+                    continue
+                cumulative = 0
+                bounds = (*histogram.buckets, "+Inf")
+                for bound, count in zip(bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        f"{name}_bucket"
+                        f"{format_labels(labels, le=bound)} {cumulative}"
+                    )
+                lines.append(
+                    f"{name}_sum{format_labels(labels)} {histogram.sum}"
+                )
+                lines.append(
+                    f"{name}_count{format_labels(labels)} {histogram.count}"
+                )
+        for name, description in COUNTERS.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} counter")
+            for (metric, labels), count in counters:
+                if metric == name:
+                    lines.append(f"{name}{format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def escape_label(value):
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def format_labels(labels, **extra):
+    pairs = (*labels, *extra.items())
+    if not pairs:
+        return ""
+    return (
+        "{"
+        + ",".join(f'{key}="{escape_label(value)}"' for key, value in pairs)
+        + "}"
+    )
+
+
+registry = MetricsRegistry()
+
+
+class SerializationTimer(threading.local):
+    """Время сериализации в текущем потоке без учёта вложенных вызовов."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.duration = None
+        self.depth = 0
+
+    def start(self):
+        self.depth += 1
+        return time.perf_counter()
+
+    def stop(self, start):
+        self.depth -= 1
+        if not self.depth:
+            self.duration = (self.duration or 0) + (
+                time.perf_counter() - start
+            )
+
+
+serialization_timer = SerializationTimer()
+
+
+class SerializationMetricsMixin:
+    """Учитывает to_representation в api_serialize_duration_seconds."""
+
+    def to_representation(self, instance):
+        start = serialization_timer.start()
+        try:
+            return super().to_representation(instance)
+        finally:
+            serialization_timer.stop(start)
+
+
+class QueryRecorder:
+    """Обёртка execute_wrapper: число, время и «форма» SQL-запросов."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.shapes[IN_LIST.sub("IN (...)", sql)] += 1
+
+
+class MetricsMiddleware:
+    """Метрики запросов к API; без API_METRICS_ENABLED отключается."""
+
+    def __init__(self, get_response):
+        if not settings.API_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.path.startswith("/api/"):
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        serialization_timer.reset()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        finish = time.perf_counter()
+        resolver_match = getattr(request, "resolver_match", None)
+        view = resolver_match.view_name if resolver_match else "unresolved"
+        if view == "api:metrics":
+            return response
+        labels = (("view", view), ("method", request.method))
+        registry.observe(
+            "api_request_duration_seconds", labels, finish - start
+        )
+        registry.observe("api_db_queries", labels, recorder.count)
+        registry.observe("api_db_duration_seconds", labels, recorder.duration)
+        if serialization_timer.duration is not None:
+            registry.observe(
+                "api_serialize_duration_seconds",
+                labels,
+                serialization_timer.duration,
+            )
+        render_start = getattr(request, "metrics_render_start", None)
+        if render_start is not None:
+            registry.observe(
+                "api_render_duration_seconds",
+                labels,
+                finish - render_start,
+            )
+        if not response.streaming:
+            registry.observe(
+                "api_response_size_bytes", labels, len(response.content)
+            )
+        if recorder.shapes:
+            sql, repeats = recorder.shapes.most_common(1)[0]
+            if repeats >= settings.API_METRICS_N_PLUS_ONE:
+                registry.inc("api_n_plus_one_total", labels)
+                logger.warning(
+                    "Возможный N+1 в %s %s: %s раз %s",
+                    request.method,
+                    view,
+                    repeats,
+                    sql,
+                )
+        return response
+
+    def process_template_response(self, request, response):
+        request.metrics_render_start = time.perf_counter()
+        return response
+
+
+def metrics_view(request):
+    if not settings.API_METRICS_ENABLED:
+        raise Http404
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4"
+    )
@@ -1,5 +1,103 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class FoodgramPagination(PageNumberPagination):
+    """Постраничная пагинация с режимом курсора по (pub_date, id)."""
+
     page_size_query_param = "limit"
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    cursor_ordering = ("-pub_date", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = (
+            self.cursor_query_param in request.query_params
+            and isinstance(queryset, QuerySet)
+        )
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        page_size = self.get_page_size(request)
+        self.count = self.get_count(queryset, request)
+        queryset = queryset.order_by(*self.cursor_ordering)
+        position = self.decode_cursor(
+            request.query_params[self.cursor_query_param]
+        )
+        if position is not None:
+            pub_date, pk = position
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk)
+            )
+        results = list(queryset[: page_size + 1])
+        self.next_position = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            last = results[-1]
+            self.next_position = (last.pub_date, last.id)
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        response = OrderedDict()
+        if self.count is not None:
+            response["count"] = self.count
+        response["next"] = self.get_next_cursor_link()
+        response["results"] = data
+        return Response(response)
+
+    def get_next_cursor_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position),
+        )
+
+    def encode_cursor(self, position):
+        pub_date, pk = position
+        payload = json.dumps([pub_date.isoformat(), pk]).encode()
+        return base64.urlsafe_b64encode(payload).decode()
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            pub_date, pk = json.loads(base64.urlsafe_b64decode(cursor))
+            pub_date = parse_datetime(pub_date)
+            if pub_date is None or not isinstance(pk, int):
+                raise ValueError
+        except (TypeError, ValueError):
+            raise NotFound("Некорректный курсор.")
+        return pub_date, pk
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == "exact":
+            return queryset.count()
+        if mode == "approx":
+            return self.get_approximate_count(queryset)
+        return None
+
+    def get_approximate_count(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return queryset.count()
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]["Plan"]["Plan Rows"]
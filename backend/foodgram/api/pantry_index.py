@@ -0,0 +1,71 @@
+import threading
+from array import array
+from collections import Counter, namedtuple
+from itertools import chain
+
+from recipes.models import IngredientRecipe
+
+from .cache import pantry_cache
+
+PantryMatch = namedtuple("PantryMatch", ("recipe_id", "matched", "total"))
+
+
+class PantryIndex:
+    """Индекс «ингредиент → рецепты» по поколению pantry_cache."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.generation = None
+        self.postings = {}
+        self.sizes = {}
+
+    def build(self):
+        postings = {}
+        sizes = Counter()
+        rows = IngredientRecipe.objects.values_list(
+            "ingredient_id", "recipe_id"
+        ).order_by()
+        for ingredient_id, recipe_id in rows.iterator():
+            recipes = postings.get(ingredient_id)
+            if recipes is None:
+                recipes = postings[ingredient_id] = array("q")
+            recipes.append(recipe_id)
+            sizes[recipe_id] += 1
+        return postings, dict(sizes)
+
+    def get_index(self):
+        generation = pantry_cache.get_generation()
+        if self.generation == generation:
+            return self.postings, self.sizes
+        with self.lock:
+            if self.generation != generation:
+                self.postings, self.sizes = self.build()
+                self.generation = generation
+            return self.postings, self.sizes
+
+    def match(self, ingredient_ids, min_coverage=0):
+        """Рецепты с любым из ингредиентов, лучшие совпадения первыми."""
+        postings, sizes = self.get_index()
+        matched = Counter(
+            chain.from_iterable(
+                postings.get(ingredient_id, ())
+                for ingredient_id in set(ingredient_ids)
+            )
+        )
+        matches = [
+            PantryMatch(recipe_id, count, sizes[recipe_id])
+            for recipe_id, count in matched.items()
+            if count >= min_coverage * sizes[recipe_id]
+        ]
+        matches.sort(
+            key=lambda match: (
+                match.matched / match.total,
+                match.matched,
+                match.recipe_id,
+            ),
+            reverse=True,
+        )
+        return matches
+
+
+pantry_index = PantryIndex()
@@ -0,0 +1,182 @@
+import csv
+import hashlib
+import io
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.core.cache import cache
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+SHOPPING_LIST_TITLE = "Перечень ингредиентов для рецептов:"
+
+
+class PDFTimeout(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "PDF не успел сформироваться, повторите запрос позже."
+    default_code = "pdf_timeout"
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Тело отдаёт stream(); render() нужен только для ошибок."""
+
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get("response")
+        if response is not None:
+            response["Content-Type"] = JSONRenderer.media_type
+        return JSONRenderer().render(data)
+
+    def stream(self, shopping_list):
+        raise NotImplementedError
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    media_type = "text/plain"
+    format = "txt"
+
+    def stream(self, shopping_list):
+        yield f"{SHOPPING_LIST_TITLE} \n"
+        for element in shopping_list:
+            yield (
+                f'- {element["name"]} '
+                f'({element["measurement_unit"]})'
+                f' - {element["amount"]}\n'
+            )
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+    def stream(self, shopping_list):
+        writer = csv.writer(Echo())
+        yield writer.writerow(("name", "measurement_unit", "amount"))
+        for element in shopping_list:
+            yield writer.writerow(
+                (
+                    element["name"],
+                    element["measurement_unit"],
+                    element["amount"],
+                )
+            )
+
+
+class JSONShoppingListRenderer(ShoppingListRenderer):
+    media_type = "application/json"
+    format = "json"
+
+    def stream(self, shopping_list):
+        yield "["
+        for index, element in enumerate(shopping_list):
+            if index:
+                yield ","
+            yield json.dumps(element, ensure_ascii=False)
+        yield "]"
+
+
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    """PDF собирается в пуле потоков и кэшируется по содержимому."""
+
+    media_type = "application/pdf"
+    format = "pdf"
+    charset = None
+
+    executor = ThreadPoolExecutor(
+        max_workers=settings.SHOPPING_LIST_PDF_WORKERS
+    )
+    lock = threading.Lock()
+    in_progress = {}
+
+    def stream(self, shopping_list):
+        # Не генератор: PDF собирается до отправки заголовков, и ошибка
+        # сборки превращается в статус ошибки, а не в обрезанный ответ.
+        shopping_list = list(shopping_list)
+        key = self.get_cache_key(shopping_list)
+        document = cache.get(key)
+        if document is None:
+            try:
+                document = self.submit(key, shopping_list).result(
+                    timeout=settings.SHOPPING_LIST_PDF_TIMEOUT
+                )
+            except TimeoutError:
+                raise PDFTimeout
+        return (document,)
+
+    def get_cache_key(self, shopping_list):
+        content = json.dumps(shopping_list, sort_keys=True).encode()
+        return "shopping_list_pdf:" + hashlib.sha256(content).hexdigest()
+
+    def submit(self, key, shopping_list):
+        with self.lock:
+            future = self.in_progress.get(key)
+            if future is None:
+                future = self.executor.submit(
+                    self.build_and_cache, key, shopping_list
+                )
+                self.in_progress[key] = future
+        return future
+
+    def build_and_cache(self, key, shopping_list):
+        try:
+            document = self.build(shopping_list)
+            cache.set(
+                key, document, settings.SHOPPING_LIST_PDF_CACHE_TIMEOUT
+            )
+            return document
+        finally:
+            with self.lock:
+                self.in_progress.pop(key, None)
+
+    def build(self, shopping_list):
+        font = "ShoppingListFont"
+        if font not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(
+                TTFont(font, settings.SHOPPING_LIST_PDF_FONT)
+            )
+        buffer = io.BytesIO()
+        page = canvas.Canvas(buffer, pagesize=A4)
+        height = A4[1]
+        margin = 50
+        line_height = 20
+        page.setFont(font, 16)
+        page.drawString(margin, height - margin, SHOPPING_LIST_TITLE)
+        y = height - margin - line_height * 2
+        page.setFont(font, 12)
+        for element in shopping_list:
+            if y < margin:
+                page.showPage()
+                page.setFont(font, 12)
+                y = height - margin
+            page.drawString(
+                margin,
+                y,
+                f'- {element["name"]} ({element["measurement_unit"]})'
+                f' - {element["amount"]}',
+            )
+            y -= line_height
+        page.save()
+        return buffer.getvalue()
+
+
+SHOPPING_LIST_RENDERERS = (
+    TextShoppingListRenderer,
+    CSVShoppingListRenderer,
+    JSONShoppingListRenderer,
+    PDFShoppingListRenderer,
+)
@@ -1,27 +1,31 @@
 from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db.models import F
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_base64.fields import Base64ImageField
+from recipes.images import enqueue
 from recipes.models import (CustomUser, Favorite, Ingredient, IngredientRecipe,
                             Recipe, ShoppingCart, Subscription, Tag)
 from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer
 
+from .fields import ImageVariantsField, StreamingBase64ImageField
+from .metrics import SerializationMetricsMixin
 
-class IngredientSerializer(ModelSerializer):
+
+class IngredientSerializer(SerializationMetricsMixin, ModelSerializer):
     class Meta:
         model = Ingredient
         fields = "__all__"
 
 
-class TagSerializer(ModelSerializer):
+class TagSerializer(SerializationMetricsMixin, ModelSerializer):
     class Meta:
         model = Tag
         fields = "__all__"
 
 
-class CustomUserSerializer(UserSerializer):
+class CustomUserSerializer(SerializationMetricsMixin, UserSerializer):
     is_subscribed = serializers.SerializerMethodField(
         read_only=True, method_name="get_is_subscribed"
     )
@@ -41,9 +45,13 @@ class CustomUserSerializer(UserSerializer):
         user = self.context.get("request").user
         if user.is_anonymous:
             return False
-        return Subscription.objects.filter(
-            user=self.context["request"].user, author=obj
-        ).exists()
+        if "subscribed_authors" not in self.context:
+            self.context["subscribed_authors"] = set(
+                Subscription.objects.filter(user=user).values_list(
+                    "author_id", flat=True
+                )
+            )
+        return obj.id in self.context["subscribed_authors"]
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -59,41 +67,80 @@ class CustomUserCreateSerializer(UserCreateSerializer):
         )
 
 
-class RecipeSerializer(ModelSerializer):
+class RecipeSerializer(SerializationMetricsMixin, ModelSerializer):
     author = CustomUserSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     ingredients = serializers.SerializerMethodField()
-    image = Base64ImageField()
+    image = StreamingBase64ImageField()
+    image_variants = ImageVariantsField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = "__all__"
+        exclude = ("image_processed",)
 
     def get_ingredients(self, obj):
-        recipe = obj
-        ingredients = recipe.ingredients.values(
-            "id",
-            "name",
-            "measurement_unit",
-            amount=F("ingredient_list__amount"),
-        )
-        return ingredients
+        return [
+            {
+                "id": element.ingredient.id,
+                "name": element.ingredient.name,
+                "measurement_unit": element.ingredient.measurement_unit,
+                "amount": element.amount,
+            }
+            for element in obj.ingredientrecipe_set.all()
+        ]
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, "is_favorited"):
+            return obj.is_favorited
         user = self.context.get("request").user
         if user.is_anonymous:
             return False
         return Favorite.objects.filter(user=user, recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, "is_in_shopping_cart"):
+            return obj.is_in_shopping_cart
         user = self.context.get("request").user
         if user.is_anonymous:
             return False
         return ShoppingCart.objects.filter(user=user, recipe=obj).exists()
 
 
+class PantryRecipeSerializer(RecipeSerializer):
+    coverage = serializers.SerializerMethodField()
+    missing_ingredients = serializers.SerializerMethodField()
+
+    def get_coverage(self, obj):
+        return round(obj.pantry_match.matched / obj.pantry_match.total, 4)
+
+    def get_missing_ingredients(self, obj):
+        pantry = self.context["pantry"]
+        return [
+            ingredient
+            for ingredient in self.get_ingredients(obj)
+            if ingredient["id"] not in pantry
+        ]
+
+
+def get_recipes_limit(request):
+    limit = request.query_params.get("recipes_limit")
+    if limit is None:
+        return None
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise serializers.ValidationError(
+            {"recipes_limit": "Ожидается целое число."}
+        )
+    if limit < 0:
+        raise serializers.ValidationError(
+            {"recipes_limit": "Значение не может быть отрицательным."}
+        )
+    return limit
+
+
 class SubscriptionSerializer(CustomUserSerializer):
     recipes_amount = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
@@ -107,16 +154,18 @@ class SubscriptionSerializer(CustomUserSerializer):
 
     def get_recipes(self, obj):
         request = self.context.get("request")
-        limit = request.GET.get("recipes_limit")
-        recipes = obj.recipes.all()
-        if limit:
-            recipes = recipes[: int(limit)]
+        if hasattr(obj, "recipes_preview"):
+            recipes = obj.recipes_preview
+        else:
+            recipes = obj.recipes.all()[: get_recipes_limit(request)]
         serializer = RecipeLimitedSerializer(
-            recipes, many=True, read_only=True
+            recipes, many=True, read_only=True, context={"request": request}
         )
         return serializer.data
 
     def get_recipes_amount(self, obj):
+        if hasattr(obj, "recipes_amount"):
+            return obj.recipes_amount
         return obj.recipes.count()
 
 
@@ -146,13 +195,13 @@ class IngredientRecipeSerializer(ModelSerializer):
         fields = ("id", "amount")
 
 
-class CreateUpdateRecipeSerializer(ModelSerializer):
+class CreateUpdateRecipeSerializer(SerializationMetricsMixin, ModelSerializer):
     author = CustomUserSerializer(read_only=True)
     tags = serializers.PrimaryKeyRelatedField(
         queryset=Tag.objects.all(), many=True
     )
     ingredients = IngredientRecipeSerializer(many=True)
-    image = Base64ImageField()
+    image = StreamingBase64ImageField()
     cooking_time = serializers.IntegerField(
         validators=(
             MinValueValidator(
@@ -172,27 +221,71 @@ class CreateUpdateRecipeSerializer(ModelSerializer):
         )
     )
 
+    def validate_ingredients(self, ingredients):
+        ids = [ingredient["id"] for ingredient in ingredients]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError(
+                "Ингредиенты не должны повторяться!"
+            )
+        found = Ingredient.objects.in_bulk(ids)
+        missing = [pk for pk in ids if pk not in found]
+        if missing:
+            raise serializers.ValidationError(
+                f"Ингредиенты не найдены: {missing}"
+            )
+        return [
+            {
+                "ingredient": found[ingredient["id"]],
+                "amount": ingredient["amount"],
+            }
+            for ingredient in ingredients
+        ]
+
+    def set_ingredients(self, recipe, ingredients):
+        existing = {
+            element.ingredient_id: element
+            for element in IngredientRecipe.objects.filter(recipe=recipe)
+        }
+        to_create = []
+        to_update = []
+        for ingredient in ingredients:
+            element = existing.pop(ingredient["ingredient"].id, None)
+            if element is None:
+                to_create.append(
+                    IngredientRecipe(
+                        ingredient=ingredient["ingredient"],
+                        recipe=recipe,
+                        amount=ingredient["amount"],
+                    )
+                )
+            elif element.amount != ingredient["amount"]:
+                element.amount = ingredient["amount"]
+                to_update.append(element)
+        if existing:
+            IngredientRecipe.objects.filter(
+                id__in=[element.id for element in existing.values()]
+            ).delete()
+        if to_update:
+            IngredientRecipe.objects.bulk_update(to_update, ("amount",))
+        if to_create:
+            IngredientRecipe.objects.bulk_create(to_create)
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop("tags", None)
         ingredients = validated_data.pop("ingredients", None)
+        if "image" in validated_data:
+            validated_data["image_processed"] = False
         instance = super().update(instance, validated_data)
+        if "image" in validated_data:
+            transaction.on_commit(lambda: enqueue(instance))
         if tags is not None:
             instance.tags.set(tags)
         if ingredients is not None:
-            instance.ingredients.clear()
-        IngredientRecipe.objects.bulk_create(
-            [
-                IngredientRecipe(
-                    ingredient=Ingredient.objects.get(id=ingredient["id"]),
-                    recipe=instance,
-                    amount=ingredient.get("amount"),
-                )
-                for ingredient in ingredients
-            ],
-        )
-        instance.save()
+            self.set_ingredients(instance, ingredients)
         return instance
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop("tags")
         ingredients = validated_data.pop("ingredients")
@@ -201,28 +294,37 @@ class CreateUpdateRecipeSerializer(ModelSerializer):
         IngredientRecipe.objects.bulk_create(
             [
                 IngredientRecipe(
-                    ingredient=Ingredient.objects.get(id=ingredient["id"]),
+                    ingredient=ingredient["ingredient"],
                     recipe=recipe,
-                    amount=ingredient.get("amount"),
+                    amount=ingredient["amount"],
                 )
                 for ingredient in ingredients
             ],
         )
+        transaction.on_commit(lambda: enqueue(recipe))
         return recipe
 
     class Meta:
         model = Recipe
-        exclude = ("pub_date",)
+        exclude = ("pub_date", "image_processed")
 
     def to_representation(self, instance):
         request = self.context.get("request")
         context = {"request": request}
+        prefetch_related_objects(
+            [instance],
+            Prefetch(
+                "ingredientrecipe_set",
+                queryset=IngredientRecipe.objects.select_related("ingredient"),
+            ),
+        )
         return RecipeSerializer(instance, context=context).data
 
 
-class RecipeLimitedSerializer(ModelSerializer):
-    image = Base64ImageField()
+class RecipeLimitedSerializer(SerializationMetricsMixin, ModelSerializer):
+    image = serializers.ImageField(read_only=True)
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "image_variants", "cooking_time")
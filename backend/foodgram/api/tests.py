@@ -0,0 +1,353 @@
+import threading
+
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.test import (TestCase, TransactionTestCase, override_settings,
+                         skipUnlessDBFeature)
+from recipes.models import (CustomUser, Favorite, Ingredient,
+                            IngredientRecipe, Recipe, ShoppingCart,
+                            Subscription, Tag, TagRecipe)
+from api.pantry_index import pantry_index
+from foodgram.asgi import application
+from rest_framework.test import APIClient
+
+TEST_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "default",
+    },
+    "responses": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "responses",
+    },
+}
+
+
+def create_user(username):
+    return CustomUser.objects.create_user(
+        username=username, email=f"{username}@example.com", password="pass"
+    )
+
+
+def create_recipes(authors, number):
+    tags = [
+        Tag.objects.create(
+            name=f"Тег {i}", slug=f"tag-{i}", color=f"#00000{i}"
+        )
+        for i in range(3)
+    ]
+    ingredients = [
+        Ingredient.objects.create(name=f"Продукт {i}", measurement_unit="г")
+        for i in range(5)
+    ]
+    Recipe.objects.bulk_create(
+        Recipe(
+            author=authors[i % len(authors)],
+            name=f"Рецепт {i}",
+            text="Описание",
+            image="recipes/images/test.png",
+            cooking_time=10,
+        )
+        for i in range(number)
+    )
+    recipes = list(Recipe.objects.order_by("id"))
+    TagRecipe.objects.bulk_create(
+        TagRecipe(recipe=recipe, tag=tag) for recipe in recipes for tag in tags
+    )
+    IngredientRecipe.objects.bulk_create(
+        IngredientRecipe(recipe=recipe, ingredient=ingredient, amount=1)
+        for recipe in recipes
+        for ingredient in ingredients
+    )
+    return recipes
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RecipeListQueriesTest(TestCase):
+    """Число запросов к списку рецептов не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user("reader")
+        authors = [create_user(f"author{i}") for i in range(10)]
+        recipes = create_recipes(authors, 60)
+        Favorite.objects.bulk_create(
+            Favorite(user=cls.user, recipe=recipe) for recipe in recipes[::2]
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=cls.user, recipe=recipe)
+            for recipe in recipes[::3]
+        )
+        Subscription.objects.bulk_create(
+            Subscription(user=cls.user, author=author)
+            for author in authors[::2]
+        )
+
+    def setUp(self):
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+        self.client = APIClient()
+
+    def assert_list_queries(self, queries):
+        for limit in (6, 50):
+            with self.subTest(limit=limit), self.assertNumQueries(queries):
+                response = self.client.get(f"/api/recipes/?limit={limit}")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data["results"]), limit)
+
+    def test_anonymous(self):
+        self.assert_list_queries(4)
+
+    def test_authenticated(self):
+        self.client.force_authenticate(self.user)
+        self.assert_list_queries(5)
+        response = self.client.get("/api/recipes/?limit=50")
+        results = response.data["results"]
+        self.assertTrue(any(recipe["is_favorited"] for recipe in results))
+        self.assertTrue(
+            any(recipe["is_in_shopping_cart"] for recipe in results)
+        )
+        self.assertTrue(
+            any(recipe["author"]["is_subscribed"] for recipe in results)
+        )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AnonymousCacheTest(TransactionTestCase):
+    def setUp(self):
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+        self.recipe = create_recipes([create_user("author")], 1)[0]
+
+    def get(self, host="testserver", path="/api/recipes/"):
+        return APIClient().get(path, HTTP_HOST=host)
+
+    def test_cache_is_per_host(self):
+        self.assertEqual(self.get("a.example")["X-Cache"], "MISS")
+        self.assertEqual(self.get("a.example")["X-Cache"], "HIT")
+        response = self.get("b.example")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertTrue(
+            response.data["results"][0]["image"].startswith(
+                "http://b.example/"
+            )
+        )
+
+    def test_favorite_keeps_feed_cached(self):
+        by_favorites = "/api/recipes/?ordering=-favorites"
+        for path in ("/api/recipes/", by_favorites):
+            self.get(path=path)
+        client = APIClient()
+        client.force_authenticate(create_user("reader"))
+        client.post(f"/api/recipes/{self.recipe.id}/favorite/")
+        self.assertEqual(self.get()["X-Cache"], "HIT")
+        self.assertEqual(self.get(path=by_favorites)["X-Cache"], "MISS")
+
+    def test_etag_without_last_modified(self):
+        response = self.get()
+        self.assertNotIn("Last-Modified", response)
+        client = APIClient()
+        for headers, status in (
+            ({"HTTP_IF_NONE_MATCH": response["ETag"]}, 304),
+            ({"HTTP_IF_MODIFIED_SINCE": "Fri, 01 Jan 2100 00:00:00 GMT"}, 200),
+        ):
+            with self.subTest(headers=headers):
+                self.assertEqual(
+                    client.get("/api/recipes/", **headers).status_code, status
+                )
+
+
+@override_settings(CACHES=TEST_CACHES, API_METRICS_ENABLED=True)
+class MetricsTest(TestCase):
+    def test_serialization_duration(self):
+        Tag.objects.create(name="Завтрак", slug="breakfast", color="#E26C2D")
+        client = APIClient()
+        self.assertEqual(client.get("/api/tags/").status_code, 200)
+        metrics = client.get("/api/metrics").content.decode()
+        self.assertIn(
+            'api_serialize_duration_seconds_count{view="api:tag-list",'
+            'method="GET"}',
+            metrics,
+        )
+
+
+class HotQueryIndexesTest(TestCase):
+    """Частые запросы к связующим таблицам идут по индексам."""
+
+    def setUp(self):
+        if connection.vendor == "postgresql":
+            # На пустых таблицах планировщик выбрал бы полный просмотр.
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assert_uses_index(self, queryset, index=None):
+        plan = queryset.explain()
+        self.assertIn("index", plan.lower(), plan)
+        self.assertNotIn("seq scan", plan.lower(), plan)
+        if index is not None:
+            self.assertIn(index, plan)
+
+    def test_named_indexes(self):
+        for queryset, index in (
+            (
+                Favorite.objects.filter(user_id=1).order_by("-added"),
+                "favorite_user_added_idx",
+            ),
+            (
+                ShoppingCart.objects.filter(user_id=1).order_by("-added"),
+                "shoppingcart_user_added_idx",
+            ),
+            (
+                Recipe.objects.filter(author_id=1).order_by("-pub_date"),
+                "recipe_author_pub_date_idx",
+            ),
+            (
+                TagRecipe.objects.filter(tag_id=1).values("recipe"),
+                "tagrecipe_tag_recipe_idx",
+            ),
+        ):
+            with self.subTest(index=index):
+                self.assert_uses_index(queryset, index)
+
+    def test_unique_lookups(self):
+        for queryset in (
+            IngredientRecipe.objects.filter(recipe_id=1, ingredient_id=1),
+            TagRecipe.objects.filter(recipe_id=1, tag_id=1),
+            Favorite.objects.filter(user_id=1, recipe_id=1),
+            ShoppingCart.objects.filter(user_id=1, recipe_id=1),
+            Subscription.objects.filter(user_id=1, author_id=2),
+            Subscription.objects.filter(author_id=2),
+        ):
+            with self.subTest(query=str(queryset.query)):
+                self.assert_uses_index(queryset)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ConcurrentFavoriteTest(TransactionTestCase):
+    threads = 8
+
+    def setUp(self):
+        self.user = create_user("reader")
+        self.recipe = create_recipes([create_user("author")], 1)[0]
+        self.url = f"/api/recipes/{self.recipe.id}/favorite/"
+
+    def request(self, method, barrier, statuses):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        try:
+            barrier.wait()
+            statuses.append(getattr(client, method)(self.url).status_code)
+        finally:
+            connection.close()
+
+    def run_concurrently(self, method):
+        barrier = threading.Barrier(self.threads)
+        statuses = []
+        workers = [
+            threading.Thread(
+                target=self.request, args=(method, barrier, statuses)
+            )
+            for _ in range(self.threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return sorted(statuses)
+
+    @skipUnlessDBFeature("test_db_allows_multiple_connections")
+    def test_concurrent_add(self):
+        self.assertEqual(
+            self.run_concurrently("post"), [201] + [400] * (self.threads - 1)
+        )
+        self.assertEqual(Favorite.objects.count(), 1)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+
+    def test_delete(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        client.post(self.url)
+        self.assertEqual(client.delete(self.url).status_code, 204)
+        self.assertEqual(client.delete(self.url).status_code, 400)
+        self.assertEqual(
+            client.delete("/api/recipes/0/favorite/").status_code, 404
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 0)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PantryIndexTest(TransactionTestCase):
+    def setUp(self):
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+        self.recipe = create_recipes([create_user("author")], 1)[0]
+        self.client = APIClient()
+        self.client.force_authenticate(create_user("reader"))
+        self.ingredient = Ingredient.objects.first()
+        self.url = f"/api/recipes/pantry/?ingredients={self.ingredient.id}"
+
+    def test_rebuilt_only_on_recipe_changes(self):
+        self.assertEqual(len(self.client.get(self.url).data["results"]), 1)
+        generation = pantry_index.generation
+        self.client.post(f"/api/recipes/{self.recipe.id}/favorite/")
+        self.client.get(self.url)
+        self.assertEqual(pantry_index.generation, generation)
+        IngredientRecipe.objects.filter(ingredient=self.ingredient).delete()
+        self.assertEqual(self.client.get(self.url).data["results"], [])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AsgiApplicationTest(TransactionTestCase):
+    def setUp(self):
+        self.started = []
+        self.finished = []
+        request_started.connect(self.on_started)
+        request_finished.connect(self.on_finished)
+        self.addCleanup(request_started.disconnect, self.on_started)
+        self.addCleanup(request_finished.disconnect, self.on_finished)
+
+    def on_started(self, **kwargs):
+        self.started.append(threading.current_thread().name)
+
+    def on_finished(self, **kwargs):
+        self.finished.append(threading.current_thread().name)
+
+    def get(self, path):
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            messages.append(message)
+
+        async_to_sync(application)(
+            {
+                "type": "http",
+                "http_version": "1.1",
+                "method": "GET",
+                "path": path,
+                "query_string": b"",
+                "headers": [(b"host", b"testserver")],
+            },
+            receive,
+            send,
+        )
+        return messages[0]["status"]
+
+    def test_request_finished(self):
+        for path in ("/api/tags/", "/api/ingredients/", "/api/users/"):
+            with self.subTest(path=path):
+                self.assertIn(self.get(path), (200, 401))
+        self.assertEqual(len(self.started), 3)
+        self.assertEqual(self.finished, self.started)
+
+    def test_hot_reads_have_own_pool(self):
+        self.get("/api/tags/")
+        self.get("/api/users/")
+        self.assertTrue(self.started[0].startswith("asgi-read"))
+        self.assertFalse(self.started[1].startswith("asgi-read"))
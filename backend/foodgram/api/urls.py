@@ -1,6 +1,7 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from .metrics import metrics_view
 from .views import (IngredientViewSet, RecipeViewSet, TagViewSet,
                     UsersSubscriptionViewSet)
 
@@ -14,6 +15,7 @@ v1_router.register("ingredients", IngredientViewSet)
 v1_router.register("users", UsersSubscriptionViewSet, basename="subscriptions")
 
 urlpatterns = [
+    path("metrics", metrics_view, name="metrics"),
     path("", include(v1_router.urls)),
     path("", include("djoser.urls")),
     path("auth/", include("djoser.urls.authtoken")),
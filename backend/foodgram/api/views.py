@@ -1,23 +1,80 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import (BooleanField, Count, Exists, F, OuterRef,
+                              Prefetch, Sum, Value, Window)
+from django.db.models.functions import Greatest, RowNumber
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from recipes.models import (CustomUser, Favorite, Ingredient, IngredientRecipe,
                             Recipe, ShoppingCart, Subscription, Tag)
-from rest_framework import exceptions, filters, mixins
+from rest_framework import exceptions, filters, mixins, status
 from rest_framework.decorators import action
 from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet, ModelViewSet
 
-from .filters import IngredientFilter, RecipeFilter
+from .cache import (COUNTERS_SCOPE, AnonymousCacheMixin,
+                    ConditionalGetMixin, ingredient_cache, recipe_cache,
+                    tag_cache)
+from .filters import RecipeFilter
+from .ingredient_index import ingredient_index
 from .pagination import FoodgramPagination
+from .pantry_index import pantry_index
 from .permissions import AuthenticatedOrAuthorOrReadOnly
+from .renderers import SHOPPING_LIST_RENDERERS
 from .serializers import (CreateUpdateRecipeSerializer, CustomUserSerializer,
-                          IngredientSerializer, RecipeSerializer,
-                          SubscriptionSerializer, TagSerializer)
+                          IngredientSerializer, PantryRecipeSerializer,
+                          RecipeSerializer, SubscriptionSerializer,
+                          TagSerializer, get_recipes_limit)
+
+
+def attach_recipes_preview(authors, limit):
+    """Последние limit рецептов каждого автора одним запросом."""
+    recipes = Recipe.objects.filter(author__in=authors)
+    if limit is not None:
+        ranked = recipes.annotate(
+            recipe_rank=Window(
+                expression=RowNumber(),
+                partition_by=[F("author_id")],
+                order_by=(F("pub_date").desc(), F("id").desc()),
+            )
+        )
+        sql, params = ranked.query.sql_with_params()
+        recipes = Recipe.objects.raw(
+            f"SELECT * FROM ({sql}) ranked WHERE ranked.recipe_rank <= %s "
+            "ORDER BY ranked.recipe_rank",
+            (*params, limit),
+        )
+    previews = {author.id: [] for author in authors}
+    for recipe in recipes:
+        previews[recipe.author_id].append(recipe)
+    for author in authors:
+        author.recipes_preview = previews[author.id]
+
+
+def decrease(counter, amount=1):
+    # Счётчик мог отстать от данных (строки из админки, до recount),
+    # поэтому он не опускается ниже нуля.
+    return Greatest(F(counter) - amount, 0)
+
+
+def add_relation(model, **fields):
+    """Создаёт связь; False, если её уже создал другой запрос."""
+    try:
+        with transaction.atomic():
+            model.objects.create(**fields)
+    except IntegrityError:
+        return False
+    return True
+
+
+def remove_relation(model, **fields):
+    """Удаляет связь и возвращает число действительно удалённых строк."""
+    deleted, _ = model.objects.filter(**fields).delete()
+    return deleted
 
 
 class ListRetrieveViewSet(
@@ -41,15 +98,61 @@ class CreateDeleteViewSet(
     pass
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, AnonymousCacheMixin, ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = (AuthenticatedOrAuthorOrReadOnly,)
     pagination_class = FoodgramPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    etag_cache = recipe_cache
+    etag_per_user = True
 
+    def get_queryset(self):
+        user = self.request.user
+        queryset = self.queryset.select_related("author").prefetch_related(
+            "tags",
+            Prefetch(
+                "ingredientrecipe_set",
+                queryset=IngredientRecipe.objects.select_related("ingredient"),
+            ),
+        )
+        if user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef("pk"))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef("pk"))
+            ),
+        )
+
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+        CustomUser.objects.filter(id=self.request.user.id).update(
+            recipes_count=F("recipes_count") + 1
+        )
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        author_id = instance.author_id
+        instance.delete()
+        CustomUser.objects.filter(id=author_id).update(
+            recipes_count=decrease("recipes_count")
+        )
+
+    def get_cache_scopes(self, request):
+        scopes = super().get_cache_scopes(request)
+        if any(
+            "favorites" in ordering
+            for ordering in request.query_params.getlist("ordering")
+        ):
+            return scopes + (COUNTERS_SCOPE,)
+        return scopes
 
     def get_serializer_class(self):
         if self.action in ("create", "partial_update", "delete"):
@@ -57,33 +160,67 @@ class RecipeViewSet(ModelViewSet):
 
         return RecipeSerializer
 
+    def get_pantry_params(self, request):
+        ingredient_ids = set()
+        for value in request.query_params.getlist("ingredients"):
+            for ingredient_id in value.split(","):
+                try:
+                    ingredient_ids.add(int(ingredient_id))
+                except ValueError:
+                    raise exceptions.ValidationError(
+                        {"ingredients": "Ожидаются id ингредиентов."}
+                    )
+        if not ingredient_ids:
+            raise exceptions.ValidationError(
+                {"ingredients": "Укажите хотя бы один ингредиент."}
+            )
+        min_coverage = request.query_params.get("min_coverage", 0)
+        try:
+            min_coverage = float(min_coverage)
+        except ValueError:
+            raise exceptions.ValidationError(
+                {"min_coverage": "Ожидается число от 0 до 1."}
+            )
+        if not 0 <= min_coverage <= 1:
+            raise exceptions.ValidationError(
+                {"min_coverage": "Ожидается число от 0 до 1."}
+            )
+        return ingredient_ids, min_coverage
+
+    @action(detail=False)
+    def pantry(self, request):
+        ingredient_ids, min_coverage = self.get_pantry_params(request)
+        matches = self.paginate_queryset(
+            pantry_index.match(ingredient_ids, min_coverage)
+        )
+        recipes = self.get_queryset().in_bulk(
+            [match.recipe_id for match in matches]
+        )
+        page = []
+        for match in matches:
+            recipe = recipes.get(match.recipe_id)
+            if recipe is not None:
+                recipe.pantry_match = match
+                page.append(recipe)
+        context = self.get_serializer_context()
+        context["pantry"] = ingredient_ids
+        serializer = PantryRecipeSerializer(page, many=True, context=context)
+        return self.get_paginated_response(serializer.data)
+
     @action(
         detail=True,
         methods=["post", "delete"],
         permission_classes=(IsAuthenticated,),
     )
     def favorite(self, request, pk):
-        user = self.request.user
-        recipe = get_object_or_404(Recipe, id=pk)
-
-        if self.request.method == "DELETE":
-            if not Favorite.objects.filter(user=user, recipe=recipe).exists():
-                raise exceptions.ValidationError("Рецепт не в избранном!")
-            get_object_or_404(Favorite, user=user, recipe=recipe).delete()
-            return Response()
-
-        if self.request.method == "POST":
-            if Favorite.objects.filter(user=user, recipe=recipe).exists():
-                raise exceptions.ValidationError(
-                    "Рецепт уже добавлен в избранное!"
-                )
-
-            Favorite.objects.create(user=user, recipe=recipe)
-            serializer = CreateUpdateRecipeSerializer(
-                recipe,
-                context={"request": request},
-            )
-            return Response(serializer.data)
+        return self.toggle_relation(
+            request,
+            pk,
+            Favorite,
+            "favorites_count",
+            "Рецепт уже добавлен в избранное!",
+            "Рецепт не в избранном!",
+        )
 
     @action(
         detail=True,
@@ -91,69 +228,116 @@ class RecipeViewSet(ModelViewSet):
         permission_classes=(IsAuthenticated,),
     )
     def shopping_cart(self, request, pk):
-        user = self.request.user
-        recipe = get_object_or_404(Recipe, id=pk)
+        return self.toggle_relation(
+            request,
+            pk,
+            ShoppingCart,
+            "shopping_cart_count",
+            "Рецепт уже добавлен в список покупок!",
+            "Рецепт не в списке покупок!",
+        )
 
-        if self.request.method == "DELETE":
-            if not ShoppingCart.objects.filter(
-                user=user, recipe=recipe
-            ).exists():
-                raise exceptions.ValidationError("Рецепт не в списке покупок!")
-            get_object_or_404(ShoppingCart, user=user, recipe=recipe).delete()
-            return Response()
-
-        if self.request.method == "POST":
-            if ShoppingCart.objects.filter(user=user, recipe=recipe).exists():
-                raise exceptions.ValidationError(
-                    "Рецепт уже добавлен в список покупок!"
+    def toggle_relation(
+        self, request, pk, model, counter, exists_message, missing_message
+    ):
+        user = request.user
+        if request.method == "DELETE":
+            with transaction.atomic():
+                deleted = remove_relation(model, user=user, recipe_id=pk)
+                if not deleted:
+                    get_object_or_404(Recipe, id=pk)
+                    raise exceptions.ValidationError(missing_message)
+                Recipe.objects.filter(id=pk).update(
+                    **{counter: decrease(counter, deleted)}
                 )
-            ShoppingCart.objects.create(user=user, recipe=recipe)
-            serializer = CreateUpdateRecipeSerializer(
-                recipe,
-                context={"request": request},
+                recipe_cache.bump_on_commit(COUNTERS_SCOPE)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        recipe = get_object_or_404(Recipe, id=pk)
+        with transaction.atomic():
+            if not add_relation(model, user=user, recipe=recipe):
+                raise exceptions.ValidationError(exists_message)
+            Recipe.objects.filter(id=recipe.id).update(
+                **{counter: F(counter) + 1}
             )
-            return Response(serializer.data)
+            recipe_cache.bump_on_commit(COUNTERS_SCOPE)
+        setattr(recipe, counter, getattr(recipe, counter) + 1)
+        serializer = CreateUpdateRecipeSerializer(
+            recipe,
+            context={"request": request},
+        )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    @action(detail=False, permission_classes=(IsAuthenticated,))
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=SHOPPING_LIST_RENDERERS,
+    )
     def download_shopping_cart(self, request):
-        shopping_cart = ShoppingCart.objects.filter(user=self.request.user)
-        recipes = [element.recipe.id for element in shopping_cart]
         shopping_list = (
-            IngredientRecipe.objects.filter(recipe__in=recipes)
-            .values("ingredient__name", "ingredient__measurement_unit")
+            IngredientRecipe.objects.filter(
+                recipe__in=ShoppingCart.objects.filter(
+                    user=self.request.user
+                ).values("recipe")
+            )
+            .values(
+                name=F("ingredient__name"),
+                measurement_unit=F("ingredient__measurement_unit"),
+            )
             .annotate(amount=Sum("amount"))
+            .order_by("name")
+        )
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f"{content_type}; charset={renderer.charset}"
+        response = StreamingHttpResponse(
+            renderer.stream(shopping_list.iterator()),
+            content_type=content_type,
+        )
+        response["Content-Disposition"] = (
+            f"attachment; filename=list_of_ingredients.{renderer.format}"
         )
-        list_of_ingredients = ["Перечень ингредиентов для рецептов: \n"]
-        list_of_ingredients += "\n".join(
-            [
-                f'- {element["ingredient__name"]} '
-                f'({element["ingredient__measurement_unit"]})'
-                f' - {element["amount"]}'
-                for element in shopping_list
-            ]
-        )
-        response = HttpResponse(list_of_ingredients, content_type="text/plain")
-        response[
-            "Content-Disposition"
-        ] = "attachment; filename=list_of_ingredients.txt"
         return response
 
 
-class TagViewSet(ListRetrieveViewSet):
+class TagViewSet(ConditionalGetMixin, ListRetrieveViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
+    etag_cache = tag_cache
 
 
-class IngredientViewSet(ListRetrieveViewSet):
+class IngredientViewSet(ConditionalGetMixin, ListRetrieveViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
-    filter_backends = (DjangoFilterBackend, filters.SearchFilter)
-    search_fields = ("^name",)
-    filterset_class = IngredientFilter
+    etag_cache = ingredient_cache
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(request, self.search)
+
+    def search(self, request):
+        name = request.query_params.get(
+            "name", request.query_params.get("search", "")
+        )
+        limit = request.query_params.get("limit")
+        if limit is None:
+            limit = settings.INGREDIENT_SEARCH_LIMIT if name else None
+        else:
+            try:
+                limit = int(limit)
+            except ValueError:
+                raise exceptions.ValidationError(
+                    {"limit": "Ожидается целое число."}
+                )
+            if limit < 1:
+                raise exceptions.ValidationError(
+                    {"limit": "Значение должно быть больше нуля."}
+                )
+        return Response(ingredient_index.search(name, limit))
 
 
 class UsersSubscriptionViewSet(UserViewSet):
@@ -170,8 +354,13 @@ class UsersSubscriptionViewSet(UserViewSet):
     )
     def subscriptions(self, request):
         user = self.request.user
-        queryset = CustomUser.objects.filter(following__user=user)
+        queryset = (
+            CustomUser.objects.filter(following__user=user)
+            .annotate(recipes_amount=Count("recipes"))
+            .order_by("id")
+        )
         pages = self.paginate_queryset(queryset)
+        attach_recipes_preview(pages, get_recipes_limit(request))
         serializer = SubscriptionSerializer(
             pages, many=True, context={"request": request}
         )
@@ -183,26 +372,34 @@ class UsersSubscriptionViewSet(UserViewSet):
     )
     def subscribe(self, request, **kwargs):
         user = self.request.user
-        author = get_object_or_404(CustomUser, id=self.kwargs.get("id"))
+        author_id = self.kwargs.get("id")
 
-        if self.request.method == "POST":
-            if Subscription.objects.filter(user=user, author=author).exists():
-                raise exceptions.ValidationError("Подписка уже оформлена.")
+        if self.request.method == "DELETE":
+            with transaction.atomic():
+                deleted = remove_relation(
+                    Subscription, user=user, author_id=author_id
+                )
+                if not deleted:
+                    get_object_or_404(CustomUser, id=author_id)
+                    raise exceptions.ValidationError("Подписки не существует")
+                CustomUser.objects.filter(id=author_id).update(
+                    followers_count=decrease("followers_count", deleted)
+                )
+            return Response(status=status.HTTP_204_NO_CONTENT)
 
-            Subscription.objects.create(user=user, author=author)
-            serializer = SubscriptionSerializer(
-                author, data=request.data, context={"request": request}
+        author = get_object_or_404(CustomUser, id=author_id)
+        if author == user:
+            raise exceptions.ValidationError(
+                "Нельзя подписаться на самого себя."
             )
-            serializer.is_valid(raise_exception=True)
-            return Response(serializer.data)
-
-        if self.request.method == "DELETE":
-            if not Subscription.objects.filter(
-                user=user, author=author
-            ).exists():
-                raise exceptions.ValidationError("Подписки не существует")
-            subscription = get_object_or_404(
-                Subscription, user=user, author=author
+        with transaction.atomic():
+            if not add_relation(Subscription, user=user, author=author):
+                raise exceptions.ValidationError("Подписка уже оформлена.")
+            CustomUser.objects.filter(id=author.id).update(
+                followers_count=F("followers_count") + 1
             )
-            subscription.delete()
-            return Response("Подписка удалена")
+        serializer = SubscriptionSerializer(
+            author, data=request.data, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -0,0 +1,11 @@
+"""Нагрузочные замеры API Foodgram.
+
+data — детерминированный генератор данных, scenarios — сценарии
+запросов, runner — их прогон. Замеры запускаются командой benchmark
+на отдельной базе, например на SQLite:
+
+    export DB_ENGINE=django.db.backends.sqlite3 DB_NAME=benchmark.sqlite3
+    python manage.py makemigrations && python manage.py migrate
+    python manage.py benchmark --scale small --output baseline.json
+    python manage.py benchmark --no-generate --baseline baseline.json
+"""
@@ -0,0 +1,239 @@
+import multiprocessing
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from api.cache import pantry_cache, tag_cache
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db.models import Max
+from recipes.images import create_placeholder
+from recipes.management.commands._private import chunked
+from recipes.models import (CustomUser, Favorite, Ingredient,
+                            IngredientRecipe, Recipe, ShoppingCart,
+                            Subscription, Tag, TagRecipe)
+
+Scale = namedtuple(
+    "Scale",
+    (
+        "users",
+        "recipes",
+        "favorites_per_user",
+        "carts_per_user",
+        "subscriptions_per_user",
+    ),
+)
+
+SCALES = {
+    "small": Scale(50, 1000, 20, 5, 5),
+    "medium": Scale(500, 20000, 50, 8, 10),
+    "large": Scale(5000, 200000, 100, 10, 20),
+}
+PASSWORD = "benchmark-password"
+BATCH_SIZE = 2000
+TAGS = (
+    ("Завтрак", "breakfast", "#E26C2D"),
+    ("Обед", "lunch", "#49B64E"),
+    ("Ужин", "dinner", "#8775D2"),
+    ("Десерт", "dessert", "#F2C94C"),
+    ("Выпечка", "bakery", "#B5651D"),
+    ("Постное", "lenten", "#2D9CDB"),
+    ("Быстро", "quick", "#EB5757"),
+    ("Праздник", "holiday", "#9B51E0"),
+)
+DISHES = (
+    "суп", "борщ", "салат", "пирог", "рагу", "плов", "омлет", "каша",
+    "запеканка", "котлеты", "блины", "паста", "ризотто", "жаркое",
+)
+QUALIFIERS = (
+    "домашний", "быстрый", "пряный", "летний", "зимний", "сырный",
+    "овощной", "грибной", "куриный", "рыбный", "постный", "праздничный",
+)
+WORDS = (
+    "нарезать", "обжарить", "добавить", "перемешать", "тушить", "запечь",
+    "посолить", "поперчить", "остудить", "подавать", "минут", "огонь",
+    "сковорода", "кастрюля", "духовка", "соус", "зелень", "масло",
+)
+
+
+class Generator:
+    """Генератор данных: одинаковые scale и seed дают те же данные."""
+
+    def __init__(
+        self,
+        scale,
+        seed=0,
+        batch_size=BATCH_SIZE,
+        images=1,
+        workers=1,
+        stdout=None,
+    ):
+        self.scale = scale
+        self.seed = seed
+        self.batch_size = batch_size
+        self.images = images
+        self.workers = workers
+        self.stdout = stdout
+        self.rng = random.Random(seed)
+
+    def report(self, label, rows, started):
+        if self.stdout is None:
+            return
+        elapsed = time.monotonic() - started
+        rate = rows / elapsed if elapsed else rows
+        self.stdout.write(
+            f"{label}: {rows} за {elapsed:.1f} с ({rate:.0f} в секунду)."
+        )
+
+    def create(self, model, objects, ignore_conflicts=False):
+        started = time.monotonic()
+        rows = 0
+        for chunk in chunked(objects, self.batch_size):
+            model.objects.bulk_create(chunk, ignore_conflicts=ignore_conflicts)
+            rows += len(chunk)
+        self.report(model.__name__, rows, started)
+
+    def create_images(self):
+        started = time.monotonic()
+        names = [
+            f"recipes/images/placeholder-{self.seed}-{number}.png"
+            for number in range(self.images)
+        ]
+        colors = [
+            "#{:06X}".format(self.rng.randrange(0x1000000)) for _ in names
+        ]
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as executor:
+            list(executor.map(create_placeholder, names, colors))
+        self.report("Images", len(names), started)
+        return names
+
+    def generate(self):
+        rng = self.rng
+        scale = self.scale
+        if not Ingredient.objects.exists():
+            call_command("load_csv", stdout=self.stdout)
+        ingredient_ids = list(
+            Ingredient.objects.order_by("id").values_list("id", flat=True)
+        )
+        Tag.objects.bulk_create(
+            (
+                Tag(name=name, slug=slug, color=color)
+                for name, slug, color in TAGS
+            ),
+            ignore_conflicts=True,
+        )
+        tag_cache.bump()
+        tag_ids = list(
+            Tag.objects.order_by("id").values_list("id", flat=True)
+        )
+        images = self.create_images()
+
+        prefix = f"fake-{self.seed}-"
+        password = make_password(PASSWORD)
+        self.create(
+            CustomUser,
+            (
+                CustomUser(
+                    username=f"{prefix}{number}",
+                    email=f"{prefix}{number}@example.com",
+                    password=password,
+                )
+                for number in range(scale.users)
+            ),
+            ignore_conflicts=True,
+        )
+        user_ids = list(
+            CustomUser.objects.filter(username__startswith=prefix)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+        last_recipe_id = Recipe.objects.aggregate(last=Max("id"))["last"]
+        self.create(
+            Recipe,
+            (
+                Recipe(
+                    author_id=rng.choice(user_ids),
+                    name=f"{rng.choice(QUALIFIERS)} {rng.choice(DISHES)}",
+                    text=" ".join(rng.choices(WORDS, k=rng.randint(10, 40))),
+                    image=images[number % len(images)],
+                    cooking_time=rng.randint(5, 180),
+                )
+                for number in range(scale.recipes)
+            ),
+        )
+        recipe_ids = list(
+            Recipe.objects.filter(id__gt=last_recipe_id or 0)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+        self.create(
+            IngredientRecipe,
+            (
+                IngredientRecipe(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500),
+                )
+                for recipe_id in recipe_ids
+                for ingredient_id in rng.sample(
+                    ingredient_ids,
+                    min(len(ingredient_ids), rng.randint(3, 12)),
+                )
+            ),
+        )
+        pantry_cache.bump()
+        self.create(
+            TagRecipe,
+            (
+                TagRecipe(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in recipe_ids
+                for tag_id in rng.sample(
+                    tag_ids, min(len(tag_ids), rng.randint(1, 3))
+                )
+            ),
+        )
+        for model, per_user in (
+            (Favorite, scale.favorites_per_user),
+            (ShoppingCart, scale.carts_per_user),
+        ):
+            self.create(
+                model,
+                (
+                    model(user_id=user_id, recipe_id=recipe_id)
+                    for user_id in user_ids
+                    for recipe_id in rng.sample(
+                        recipe_ids, min(per_user, len(recipe_ids))
+                    )
+                ),
+            )
+        self.create(
+            Subscription,
+            (
+                Subscription(user_id=user_id, author_id=author_id)
+                for user_id in user_ids
+                for author_id in rng.sample(
+                    user_ids,
+                    min(scale.subscriptions_per_user + 1, len(user_ids)),
+                )
+                if author_id != user_id
+            ),
+            ignore_conflicts=True,
+        )
+
+        for command in (
+            "recount",
+            "refresh_popularity",
+            "rebuild_search_index",
+        ):
+            call_command(command, stdout=self.stdout)
+
+
+def generate(scale, seed=0, stdout=None):
+    """Заполняет базу данными для замеров одним процессом."""
+    Generator(scale, seed, stdout=stdout).generate()
@@ -0,0 +1,84 @@
+import math
+import random
+import time
+from collections import namedtuple
+
+from api.metrics import QueryRecorder
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client
+
+Result = namedtuple(
+    "Result",
+    (
+        "scenario",
+        "requests",
+        "errors",
+        "p50",
+        "p95",
+        "p99",
+        "throughput",
+        "queries",
+        "size",
+    ),
+)
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга; values отсортированы."""
+    if not values:
+        return 0
+    rank = max(1, math.ceil(percent / 100 * len(values)))
+    return values[rank - 1]
+
+
+def get_response(client, path, params, headers):
+    """Ответ и размер его тела в байтах."""
+    response = client.get(path, params, **headers)
+    if response.streaming:
+        size = sum(len(chunk) for chunk in response.streaming_content)
+    else:
+        size = len(response.content)
+    return response, size
+
+
+def run_scenario(scenario, fixtures, iterations, warmup=10, seed=0):
+    """Прогоняет сценарий тестовым клиентом; время в миллисекундах."""
+    rng = random.Random(seed)
+    client = Client()
+    headers = {}
+    if scenario.authenticated:
+        headers["HTTP_AUTHORIZATION"] = f"Token {fixtures.token}"
+    # История троттлинга хранится в кэше default.
+    caches["default"].clear()
+    for _ in range(warmup):
+        get_response(client, *scenario.get_request(rng, fixtures), headers)
+    recorder = QueryRecorder()
+    latencies = []
+    errors = 0
+    size = 0
+    started = time.perf_counter()
+    with connection.execute_wrapper(recorder):
+        for _ in range(iterations):
+            path, params = scenario.get_request(rng, fixtures)
+            request_started = time.perf_counter()
+            response, response_size = get_response(
+                client, path, params, headers
+            )
+            size += response_size
+            latencies.append(time.perf_counter() - request_started)
+            if response.status_code >= 400:
+                errors += 1
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return Result(
+        scenario=scenario.name,
+        requests=iterations,
+        errors=errors,
+        p50=percentile(latencies, 50) * 1000,
+        p95=percentile(latencies, 95) * 1000,
+        p99=percentile(latencies, 99) * 1000,
+        throughput=iterations / elapsed if elapsed else 0,
+        queries=recorder.count / iterations if iterations else 0,
+        size=size / iterations if iterations else 0,
+    )
@@ -0,0 +1,71 @@
+import math
+import random
+from collections import namedtuple
+
+from django.conf import settings
+from recipes.models import CustomUser, Ingredient, Recipe
+from rest_framework.authtoken.models import Token
+
+Scenario = namedtuple("Scenario", ("name", "authenticated", "get_request"))
+Fixtures = namedtuple(
+    "Fixtures", ("token", "recipe_ids", "feed_pages", "ingredient_prefixes")
+)
+MAX_FEED_PAGE = 20
+
+
+def load_fixtures(seed=0):
+    """Данные для параметров сценариев."""
+    rng = random.Random(seed)
+    user = CustomUser.objects.order_by("id").first()
+    token, _ = Token.objects.get_or_create(user=user)
+    recipe_ids = list(
+        Recipe.objects.order_by("id").values_list("id", flat=True)
+    )
+    feed_pages = max(
+        1,
+        min(
+            MAX_FEED_PAGE,
+            math.ceil(len(recipe_ids) / settings.REST_FRAMEWORK["PAGE_SIZE"]),
+        ),
+    )
+    names = list(
+        Ingredient.objects.order_by("id").values_list("name", flat=True)
+    )
+    prefixes = sorted(
+        {
+            name[: rng.randint(1, 4)]
+            for name in rng.sample(names, min(100, len(names)))
+        }
+    )
+    return Fixtures(token.key, recipe_ids, feed_pages, prefixes)
+
+
+def feed(rng, fixtures):
+    return "/api/recipes/", {"page": rng.randint(1, fixtures.feed_pages)}
+
+
+def recipe_detail(rng, fixtures):
+    return f"/api/recipes/{rng.choice(fixtures.recipe_ids)}/", {}
+
+
+def ingredient_autocomplete(rng, fixtures):
+    return "/api/ingredients/", {
+        "name": rng.choice(fixtures.ingredient_prefixes)
+    }
+
+
+def subscriptions(rng, fixtures):
+    return "/api/users/subscriptions/", {"recipes_limit": 3}
+
+
+def shopping_cart_download(rng, fixtures):
+    return "/api/recipes/download_shopping_cart/", {"format": "txt"}
+
+
+SCENARIOS = (
+    Scenario("feed", True, feed),
+    Scenario("recipe_detail", True, recipe_detail),
+    Scenario("ingredient_autocomplete", False, ingredient_autocomplete),
+    Scenario("subscriptions", True, subscriptions),
+    Scenario("shopping_cart_download", True, shopping_cart_download),
+)
@@ -0,0 +1,121 @@
+import http.client
+import random
+import shlex
+import socket
+import subprocess
+import threading
+import time
+from urllib.parse import urlencode
+
+from .runner import Result, percentile
+
+SERVERS = {
+    "wsgi": (
+        "gunicorn foodgram.wsgi:application --workers {workers} "
+        "--bind 127.0.0.1:{port}"
+    ),
+    "asgi": (
+        "uvicorn foodgram.asgi:application --workers {workers} "
+        "--host 127.0.0.1 --port {port} --no-access-log"
+    ),
+}
+
+
+def wait_for_port(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Сервер не открыл порт {port} за {timeout} с.")
+
+
+class Server:
+    """Сервер приложения в отдельном процессе на время замера."""
+
+    def __init__(self, command, port, timeout=30):
+        self.command = command
+        self.port = port
+        self.timeout = timeout
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            shlex.split(self.command),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_port(self.port, self.timeout)
+        except TimeoutError:
+            self.process.kill()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(self.timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def fetch(port, path, params, headers):
+    if params:
+        path = f"{path}?{urlencode(params)}"
+    started = time.perf_counter()
+    try:
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+        failed = response.status >= 400
+    except OSError:
+        failed = True
+    return time.perf_counter() - started, failed
+
+
+def run_load(port, scenario, fixtures, requests, concurrency, seed=0):
+    """Держит concurrency соединений, по новому на каждый запрос."""
+    rng = random.Random(seed)
+    planned = [scenario.get_request(rng, fixtures) for _ in range(requests)]
+    headers = {"Connection": "close"}
+    if scenario.authenticated:
+        headers["Authorization"] = f"Token {fixtures.token}"
+    lock = threading.Lock()
+    latencies = []
+    errors = []
+
+    def worker():
+        while True:
+            with lock:
+                if not planned:
+                    return
+                path, params = planned.pop()
+            elapsed, failed = fetch(port, path, params, headers)
+            with lock:
+                latencies.append(elapsed)
+                if failed:
+                    errors.append(path)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return Result(
+        scenario=scenario.name,
+        requests=requests,
+        errors=len(errors),
+        p50=percentile(latencies, 50) * 1000,
+        p95=percentile(latencies, 95) * 1000,
+        p99=percentile(latencies, 99) * 1000,
+        throughput=requests / elapsed if elapsed else 0,
+        queries=None,
+    )
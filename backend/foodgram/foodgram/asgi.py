@@ -3,14 +3,106 @@ ASGI config for foodgram project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
-For more information on this file, see
-https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+Django 2.2 has no ASGI handler, so the WSGI application is wrapped in
+asgiref's WSGI adapter and served by uvicorn:
+
+    uvicorn foodgram.asgi:application --host 0.0.0.0 --port 8000
 """
 
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 
-from django.core.asgi import get_asgi_application
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "foodgram.settings")
 
-application = get_asgi_application()
+LATIN_1 = "latin-1"
+HOT_READ_PATH = re.compile(
+    r"^/api/(tags/|ingredients/|recipes/(\d+/|download_shopping_cart/))"
+)
+
+
+class FoodgramWsgiToAsgiInstance(WsgiToAsgiInstance):
+    # asgiref по умолчанию выполняет все запросы в одном общем потоке.
+    executor = ThreadPoolExecutor(
+        settings.ASGI_THREADS, thread_name_prefix="asgi"
+    )
+    # Частые чтения не должны ждать медленные записи и выгрузки.
+    read_executor = ThreadPoolExecutor(
+        settings.ASGI_READ_THREADS, thread_name_prefix="asgi-read"
+    )
+
+    def get_executor(self):
+        if self.scope["method"] in ("GET", "HEAD") and HOT_READ_PATH.match(
+            self.scope["path"]
+        ):
+            return self.read_executor
+        return self.executor
+
+    async def run_wsgi_app(self, body):
+        await sync_to_async(
+            self.serve, thread_sensitive=False, executor=self.get_executor()
+        )(body)
+
+    def serve(self, body):
+        # В отличие от asgiref, вызывает close() у ответа: без него
+        # Django не отправляет request_finished и не закрывает соединения.
+        result = self.wsgi_application(
+            self.build_environ(self.scope, body), self.start_response
+        )
+        try:
+            self.send_body(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+
+    def send_body(self, result):
+        bytes_sent = 0
+        for output in result:
+            if not self.response_started:
+                self.response_started = True
+                self.sync_send(self.response_start)
+            if self.response_content_length is not None:
+                output = output[:self.response_content_length - bytes_sent]
+            self.sync_send(
+                {
+                    "type": "http.response.body",
+                    "body": output,
+                    "more_body": True,
+                }
+            )
+            bytes_sent += len(output)
+            if bytes_sent == self.response_content_length:
+                break
+        if not self.response_started:
+            self.response_started = True
+            self.sync_send(self.response_start)
+        self.sync_send({"type": "http.response.body"})
+
+    def build_environ(self, scope, body):
+        # asgiref декодирует строку запроса как ASCII и склеивает
+        # повторные заголовки запятой, что ломает Cookie.
+        environ = super().build_environ(dict(scope, query_string=b""), body)
+        environ["QUERY_STRING"] = scope["query_string"].decode(LATIN_1)
+        cookies = [
+            value.decode(LATIN_1)
+            for name, value in scope["headers"]
+            if name == b"cookie"
+        ]
+        if cookies:
+            environ["HTTP_COOKIE"] = "; ".join(cookies)
+        return environ
+
+
+class FoodgramWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await FoodgramWsgiToAsgiInstance(self.wsgi_application)(
+            scope, receive, send
+        )
+
+
+application = FoodgramWsgiToAsgi(get_wsgi_application())
@@ -19,6 +19,17 @@ ALLOWED_HOSTS = ["*", "backend"]
 
 INGREDIENT_LOWER_LIMIT = 1
 INGREDIENT_UPPER_LIMIT = 32000
+INGREDIENT_SEARCH_LIMIT = 50
+POPULARITY_DAYS = 7
+SEARCH_CONFIG = "russian"
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    "SHOPPING_LIST_PDF_FONT",
+    default="/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+)
+SHOPPING_LIST_PDF_WORKERS = 2
+SHOPPING_LIST_PDF_TIMEOUT = 30
+SHOPPING_LIST_PDF_CACHE_TIMEOUT = 60 * 60 * 24
 
 
 INSTALLED_APPS = [
@@ -38,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -81,6 +93,33 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "responses": {
+        "BACKEND": os.getenv(
+            "RESPONSE_CACHE_BACKEND",
+            default="django.core.cache.backends.filebased.FileBasedCache",
+        ),
+        "LOCATION": os.getenv(
+            "RESPONSE_CACHE_LOCATION",
+            default=os.path.join(BASE_DIR, "cache"),
+        ),
+    },
+}
+RESPONSE_CACHE_ALIAS = "responses"
+RESPONSE_CACHE_TIMEOUT = 60 * 5
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 60
+TOKEN_CACHE_ALIAS = os.getenv("TOKEN_CACHE_ALIAS")
+
+API_METRICS_ENABLED = os.getenv("API_METRICS_ENABLED", default="") == "1"
+API_METRICS_N_PLUS_ONE = 10
+
+ASGI_THREADS = int(os.getenv("ASGI_THREADS", default=16))
+ASGI_READ_THREADS = int(os.getenv("ASGI_READ_THREADS", default=8))
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -116,6 +155,12 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+IMAGE_QUEUE_DIR = os.path.join(BASE_DIR, "image_queue")
+IMAGE_WORKERS = 2
+RECIPE_IMAGE_WIDTHS = (320, 640, 1280)
+RECIPE_IMAGE_QUALITY = 80
+RECIPE_IMAGE_MAX_SIZE = 2 * 1024 * 1024
+
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -124,7 +169,7 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.AllowAny",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
     "PAGE_SIZE": 6,
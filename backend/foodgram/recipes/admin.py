@@ -4,7 +4,14 @@ from .models import Ingredient, Recipe, Subscription, Tag
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ("id", "name", "text", "pub_date", "author")
+    list_display = (
+        "id",
+        "name",
+        "text",
+        "pub_date",
+        "author",
+        "favorites_count",
+    )
     search_fields = ("name", "author")
 
 
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class RecipesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "recipes"
+
+    def ready(self):
+        from .search import connect_signals, create_search_table
+
+        connect_signals()
+        post_migrate.connect(create_search_table, sender=self)
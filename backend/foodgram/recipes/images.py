@@ -0,0 +1,107 @@
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from PIL import Image
+
+PENDING = "pending"
+PROCESSING = "processing"
+FAILED = "failed"
+VARIANT_FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+
+
+def get_queue_dir(state):
+    path = os.path.join(settings.IMAGE_QUEUE_DIR, state)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def get_variant_name(image_name, width, extension):
+    name = os.path.splitext(os.path.basename(image_name))[0]
+    return f"recipes/variants/{name}-{width}.{extension}"
+
+
+def get_variants(recipe):
+    """Ссылки на уменьшенные копии картинки рецепта по ширине и формату."""
+    if not recipe.image_processed:
+        return {}
+    return {
+        width: {
+            extension: default_storage.url(
+                get_variant_name(recipe.image.name, width, extension)
+            )
+            for extension in VARIANT_FORMATS
+        }
+        for width in settings.RECIPE_IMAGE_WIDTHS
+    }
+
+
+def enqueue(recipe):
+    """Атомарно ставит картинку рецепта в файловую очередь."""
+    pending = get_queue_dir(PENDING)
+    job_name = f"{time.time_ns()}-{recipe.id}.json"
+    temporary_path = os.path.join(pending, f".{job_name}")
+    with open(temporary_path, "w", encoding="utf-8") as job_file:
+        json.dump({"recipe": recipe.id, "image": recipe.image.name}, job_file)
+    os.replace(temporary_path, os.path.join(pending, job_name))
+
+
+def claim_jobs():
+    """Забирает задания из очереди, перенося их в каталог обработки."""
+    pending = get_queue_dir(PENDING)
+    processing = get_queue_dir(PROCESSING)
+    for job_name in sorted(os.listdir(pending)):
+        if job_name.startswith("."):
+            continue
+        path = os.path.join(processing, job_name)
+        try:
+            os.rename(os.path.join(pending, job_name), path)
+        except FileNotFoundError:
+            continue
+        yield path
+
+
+def requeue_jobs():
+    """Возвращает в очередь задания, брошенные остановленным воркером."""
+    pending = get_queue_dir(PENDING)
+    processing = get_queue_dir(PROCESSING)
+    for job_name in os.listdir(processing):
+        os.replace(
+            os.path.join(processing, job_name), os.path.join(pending, job_name)
+        )
+
+
+def fail_job(path):
+    os.replace(
+        path, os.path.join(get_queue_dir(FAILED), os.path.basename(path))
+    )
+
+
+def build_variants(image_name):
+    """Копии картинки всех ширин в WebP и JPEG; без базы данных."""
+    with Image.open(default_storage.path(image_name)) as source:
+        source = source.convert("RGB")
+        for width in settings.RECIPE_IMAGE_WIDTHS:
+            image = source.copy()
+            image.thumbnail((width, source.height))
+            for extension, image_format in VARIANT_FORMATS.items():
+                path = default_storage.path(
+                    get_variant_name(image_name, width, extension)
+                )
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                image.save(
+                    path,
+                    image_format,
+                    quality=settings.RECIPE_IMAGE_QUALITY,
+                )
+    return image_name
+
+
+def create_placeholder(image_name, color, size=(256, 256)):
+    """Однотонная картинка-заглушка для тестовых данных."""
+    path = default_storage.path(image_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.new("RGB", size, color).save(path, "PNG")
+    return image_name
@@ -0,0 +1,63 @@
+import csv
+import json
+import os
+from itertools import islice
+
+from django.conf import settings
+
+HEADER = ["name", "measurement_unit"]
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def get_data_path(file_name):
+    if os.path.isabs(file_name):
+        return file_name
+    return os.path.join(settings.BASE_DIR, "data", file_name)
+
+
+def read_csv(data_file):
+    for row in csv.reader(data_file, delimiter=","):
+        if row == HEADER:
+            continue
+        yield row[0], row[1]
+
+
+def read_json(data_file):
+    """Потоково разбирает JSON-массив объектов, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n[,":
+            position += 1
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        try:
+            element, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                if buffer[position:].strip():
+                    raise
+                return
+            chunk = data_file.read(JSON_CHUNK_SIZE)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield element["name"], element["measurement_unit"]
+
+
+def get_rows(data_file, file_name):
+    if file_name.endswith(".json"):
+        return read_json(data_file)
+    return read_csv(data_file)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
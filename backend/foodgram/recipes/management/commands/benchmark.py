@@ -0,0 +1,153 @@
+import json
+import time
+
+from api.cache import ingredient_cache, recipe_cache, tag_cache
+from benchmarks.data import SCALES, generate
+from benchmarks.runner import run_scenario
+from benchmarks.scenarios import SCENARIOS, load_fixtures
+from django.core.management.base import BaseCommand, CommandError
+from recipes.models import Recipe
+
+REPORT_HEADER = (
+    f"{'Сценарий':<26}{'запросов':>9}{'ошибок':>8}{'p50, мс':>10}"
+    f"{'p95, мс':>10}{'p99, мс':>10}{'RPS':>9}{'SQL/запрос':>12}"
+    f"{'байт/ответ':>12}"
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует воспроизводимые данные и замеряет основные сценарии "
+        "API. Запускайте на отдельной базе, например на SQLite."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale",
+            choices=SCALES,
+            default="small",
+            help="Объём генерируемых данных.",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Зерно генератора данных и параметров запросов.",
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=200,
+            help="Количество замеряемых запросов на сценарий.",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=10,
+            help="Количество прогревочных запросов на сценарий.",
+        )
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            choices=[scenario.name for scenario in SCENARIOS],
+            help="Запустить только указанные сценарии.",
+        )
+        parser.add_argument(
+            "--no-generate",
+            action="store_true",
+            help="Не генерировать данные, а замерять на уже имеющихся.",
+        )
+        parser.add_argument(
+            "--output",
+            help="Сохранить результаты в JSON-файл.",
+        )
+        parser.add_argument(
+            "--baseline",
+            help="JSON-файл с прошлыми результатами для сравнения.",
+        )
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            default=20,
+            help="Допустимый рост p95 относительно baseline, в процентах.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["no_generate"]:
+            if Recipe.objects.exists():
+                raise CommandError(
+                    "В базе уже есть рецепты. Используйте отдельную базу "
+                    "или флаг --no-generate."
+                )
+            started = time.monotonic()
+            generate(SCALES[options["scale"]], options["seed"], self.stdout)
+            self.stdout.write(
+                f"Данные сгенерированы за "
+                f"{time.monotonic() - started:.1f} с."
+            )
+        for response_cache in (recipe_cache, tag_cache, ingredient_cache):
+            response_cache.bump()
+
+        fixtures = load_fixtures(options["seed"])
+        selected = options["scenario"]
+        results = [
+            run_scenario(
+                scenario,
+                fixtures,
+                options["iterations"],
+                options["warmup"],
+                options["seed"],
+            )
+            for scenario in SCENARIOS
+            if not selected or scenario.name in selected
+        ]
+        self.stdout.write(REPORT_HEADER)
+        for result in results:
+            self.stdout.write(
+                f"{result.scenario:<26}{result.requests:>9}"
+                f"{result.errors:>8}{result.p50:>10.1f}{result.p95:>10.1f}"
+                f"{result.p99:>10.1f}{result.throughput:>9.1f}"
+                f"{result.queries:>12.1f}{result.size:>12.0f}"
+            )
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as output:
+                json.dump(
+                    [result._asdict() for result in results], output, indent=2
+                )
+        if options["baseline"]:
+            self.compare(results, options["baseline"], options)
+
+    def compare(self, results, baseline_path, options):
+        with open(baseline_path, encoding="utf-8") as baseline_file:
+            baseline = {
+                result["scenario"]: result
+                for result in json.load(baseline_file)
+            }
+        regressions = []
+        for result in results:
+            previous = baseline.get(result.scenario)
+            if previous is None or not previous["p95"]:
+                continue
+            change = (result.p95 / previous["p95"] - 1) * 100
+            if change > options["max_regression"]:
+                regressions.append(
+                    f"{result.scenario}: p95 {previous['p95']:.1f} → "
+                    f"{result.p95:.1f} мс (+{change:.0f}%)"
+                )
+            if result.queries > previous["queries"]:
+                regressions.append(
+                    f"{result.scenario}: SQL-запросов "
+                    f"{previous['queries']:.1f} → {result.queries:.1f}"
+                )
+            size = previous.get("size")
+            growth = (result.size / size - 1) * 100 if size else 0
+            if growth > options["max_regression"]:
+                regressions.append(
+                    f"{result.scenario}: размер ответа {size:.0f} → "
+                    f"{result.size:.0f} байт (+{growth:.0f}%)"
+                )
+        if regressions:
+            raise CommandError(
+                "Обнаружены регрессии:\n" + "\n".join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS("Регрессий нет."))
@@ -0,0 +1,82 @@
+from benchmarks.scenarios import SCENARIOS, load_fixtures
+from benchmarks.servers import SERVERS, Server, run_load
+from django.core.management.base import BaseCommand
+
+HOT_READS = (
+    "recipe_detail",
+    "ingredient_autocomplete",
+    "shopping_cart_download",
+)
+REPORT_HEADER = (
+    f"{'Сервер':<8}{'Сценарий':<26}{'запросов':>9}{'ошибок':>8}"
+    f"{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}{'RPS':>9}"
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает пропускную способность WSGI (gunicorn) и ASGI "
+        "(uvicorn) при одновременных соединениях на уже заполненной базе."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--server",
+            action="append",
+            choices=SERVERS,
+            help="Замерять только указанные серверы.",
+        )
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            choices=[scenario.name for scenario in SCENARIOS],
+            help="Сценарии; по умолчанию — частые чтения.",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=500,
+            help="Количество запросов на сценарий.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=50,
+            help="Количество одновременных соединений.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=2,
+            help="Количество процессов каждого сервера.",
+        )
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        fixtures = load_fixtures(options["seed"])
+        selected = options["scenario"] or HOT_READS
+        scenarios = [
+            scenario for scenario in SCENARIOS if scenario.name in selected
+        ]
+        self.stdout.write(REPORT_HEADER)
+        for server in options["server"] or SERVERS:
+            command = SERVERS[server].format(
+                workers=options["workers"], port=options["port"]
+            )
+            with Server(command, options["port"]):
+                for scenario in scenarios:
+                    result = run_load(
+                        options["port"],
+                        scenario,
+                        fixtures,
+                        options["requests"],
+                        options["concurrency"],
+                        options["seed"],
+                    )
+                    self.stdout.write(
+                        f"{server:<8}{result.scenario:<26}"
+                        f"{result.requests:>9}{result.errors:>8}"
+                        f"{result.p50:>10.1f}{result.p95:>10.1f}"
+                        f"{result.p99:>10.1f}{result.throughput:>9.1f}"
+                    )
@@ -0,0 +1,81 @@
+import time
+
+from benchmarks.data import BATCH_SIZE, SCALES, Generator, Scale
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет базу воспроизводимыми тестовыми данными: пользователями, "
+        "рецептами, избранным, списками покупок и подписками."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale",
+            choices=SCALES,
+            default="small",
+            help="Готовый набор объёмов; отдельные объёмы задаются ниже.",
+        )
+        for name, help_text in (
+            ("users", "Количество пользователей."),
+            ("recipes", "Количество рецептов."),
+            ("favorites-per-user", "Рецептов в избранном у пользователя."),
+            ("carts-per-user", "Рецептов в списке покупок пользователя."),
+            ("subscriptions-per-user", "Подписок у пользователя."),
+        ):
+            parser.add_argument(f"--{name}", type=int, help=help_text)
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Зерно генератора; одинаковое зерно даёт одинаковые данные.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Количество строк в одном bulk_create.",
+        )
+        parser.add_argument(
+            "--images",
+            type=int,
+            default=100,
+            help="Количество разных картинок-заглушек.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.IMAGE_WORKERS,
+            help="Количество процессов для рисования картинок.",
+        )
+
+    def handle(self, *args, **options):
+        scale = SCALES[options["scale"]]
+        scale = Scale(
+            *(
+                options[field] if options[field] is not None else default
+                for field, default in zip(Scale._fields, scale)
+            )
+        )
+        if min(scale) < 0 or options["batch_size"] < 1:
+            raise CommandError("Объёмы не могут быть отрицательными.")
+        if scale.users < 1 or options["images"] < 1:
+            raise CommandError(
+                "Нужны хотя бы один пользователь и одна картинка."
+            )
+        started = time.monotonic()
+        Generator(
+            scale,
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            images=options["images"],
+            workers=options["workers"],
+            stdout=self.stdout,
+        ).generate()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Данные сгенерированы за {time.monotonic() - started:.1f} с."
+            )
+        )
@@ -1,24 +1,73 @@
-import csv
-import os
+import time
 
-from django.conf import settings
-from django.core.management.base import BaseCommand
+from api.cache import ingredient_cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from recipes.models import Ingredient
 
-
-def get_reader(file_name):
-    csv_path = os.path.join(settings.BASE_DIR, "data", file_name)
-    csv_file = open(csv_path, "r", encoding="utf-8")
-    reader = csv.reader(csv_file, delimiter=",")
-    return reader
+from ._private import chunked, get_data_path, get_rows
 
 
 class Command(BaseCommand):
+    help = "Загружает ингредиенты из CSV- или JSON-файла в каталоге data."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--file",
+            default="ingredients.csv",
+            help="Файл с ингредиентами (.csv или .json).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Количество строк, обрабатываемых за один раз.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Прочитать файл без записи в базу данных.",
+        )
+
     def handle(self, *args, **options):
-        csv_reader = get_reader("ingredients.csv")
-        next(csv_reader, None)
-        for row in csv_reader:
-            obj, created = Ingredient.objects.get_or_create(
-                name=row[0], measurement_unit=row[1]
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size должен быть больше нуля.")
+        file_name = options["file"]
+        dry_run = options["dry_run"]
+        rows = 0
+        started = time.monotonic()
+        with open(get_data_path(file_name), encoding="utf-8") as data_file:
+            with transaction.atomic():
+                before = Ingredient.objects.count()
+                for chunk in chunked(
+                    get_rows(data_file, file_name), options["batch_size"]
+                ):
+                    rows += len(chunk)
+                    if dry_run:
+                        continue
+                    Ingredient.objects.bulk_create(
+                        (
+                            Ingredient(name=name, measurement_unit=unit)
+                            for name, unit in chunk
+                        ),
+                        ignore_conflicts=True,
+                    )
+                created = Ingredient.objects.count() - before
+        if not dry_run:
+            # bulk_create не отправляет сигналы, поэтому поколение
+            # справочника сдвигается явно для всех процессов.
+            ingredient_cache.bump()
+        elapsed = time.monotonic() - started
+        rate = rows / elapsed if elapsed else rows
+        if dry_run:
+            self.stdout.write(
+                f"Прочитано строк: {rows} ({rate:.0f} строк/с), "
+                "база данных не изменена."
+            )
+            return
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Ингридиенты добавлены! Прочитано строк: {rows}, "
+                f"новых: {created} ({rate:.0f} строк/с)."
             )
-        print("Ингридиенты добавлены!")
+        )
@@ -0,0 +1,72 @@
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from api.cache import recipe_cache
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from recipes.images import (build_variants, claim_jobs, fail_job,
+                            requeue_jobs)
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Готовит уменьшенные копии картинок рецептов из очереди."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.IMAGE_WORKERS,
+            help="Количество процессов обработки.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Пауза между проверками пустой очереди, в секундах.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Обработать текущие задания и завершиться.",
+        )
+
+    def handle(self, *args, **options):
+        requeue_jobs()
+        with ProcessPoolExecutor(
+            max_workers=options["workers"],
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as executor:
+            while True:
+                jobs = {}
+                processed = 0
+                for path in claim_jobs():
+                    with open(path, encoding="utf-8") as job_file:
+                        job = json.load(job_file)
+                    future = executor.submit(build_variants, job["image"])
+                    jobs[future] = (path, job)
+                for future in as_completed(jobs):
+                    path, job = jobs[future]
+                    try:
+                        future.result()
+                    except Exception as error:
+                        fail_job(path)
+                        self.stderr.write(
+                            f"Не удалось обработать {job['image']}: {error}"
+                        )
+                        continue
+                    Recipe.objects.filter(
+                        id=job["recipe"], image=job["image"]
+                    ).update(image_processed=True)
+                    os.remove(path)
+                    processed += 1
+                if processed:
+                    recipe_cache.bump()
+                    self.stdout.write(f"Обработано картинок: {processed}")
+                if options["once"]:
+                    return
+                if not jobs:
+                    time.sleep(options["interval"])
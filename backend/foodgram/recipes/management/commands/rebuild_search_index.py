@@ -0,0 +1,35 @@
+from api.cache import pantry_cache, recipe_cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.models import Recipe
+from recipes.search import create_search_table, update_documents
+
+from ._private import chunked
+
+
+class Command(BaseCommand):
+    help = "Пересобирает поисковые документы всех рецептов."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Количество рецептов, обрабатываемых за один запрос.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size должен быть больше нуля.")
+        create_search_table()
+        total = 0
+        ids = Recipe.objects.values_list("id", flat=True).iterator()
+        for chunk in chunked(ids, options["batch_size"]):
+            with transaction.atomic():
+                update_documents(chunk)
+            total += len(chunk)
+        recipe_cache.bump()
+        pantry_cache.bump()
+        self.stdout.write(
+            self.style.SUCCESS(f"Поисковый индекс пересобран: {total}.")
+        )
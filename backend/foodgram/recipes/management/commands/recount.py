@@ -0,0 +1,50 @@
+from api.cache import recipe_cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import (CustomUser, Favorite, Recipe, ShoppingCart,
+                            Subscription)
+
+
+def count_subquery(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает счётчики избранного, списков покупок, рецептов "
+        "и подписчиков по фактическим данным."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipes = Recipe.objects.update(
+                favorites_count=count_subquery(Favorite.objects, "recipe"),
+                shopping_cart_count=count_subquery(
+                    ShoppingCart.objects, "recipe"
+                ),
+            )
+            users = CustomUser.objects.update(
+                recipes_count=count_subquery(Recipe.objects, "author"),
+                followers_count=count_subquery(
+                    Subscription.objects, "author"
+                ),
+            )
+        recipe_cache.bump()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Счётчики пересчитаны: рецептов {recipes}, "
+                f"пользователей {users}."
+            )
+        )
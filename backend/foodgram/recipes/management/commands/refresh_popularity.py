@@ -0,0 +1,61 @@
+import time
+from datetime import timedelta
+
+from api.cache import recipe_cache
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from recipes.models import Favorite, RecipePopularity
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает популярность рецептов по добавлениям в избранное."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.POPULARITY_DAYS,
+            help="За сколько последних дней учитывать избранное.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help=(
+                "Повторять пересчёт с этой паузой в секундах. "
+                "Без параметра пересчёт выполняется один раз."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["interval"] is not None and options["interval"] <= 0:
+            raise CommandError("--interval должен быть больше нуля.")
+        while True:
+            self.refresh(options["days"])
+            if options["interval"] is None:
+                return
+            time.sleep(options["interval"])
+
+    def refresh(self, days):
+        since = timezone.now() - timedelta(days=days)
+        scores = (
+            Favorite.objects.filter(added__gte=since)
+            .order_by()
+            .values("recipe")
+            .annotate(score=Count("id"))
+        )
+        with transaction.atomic():
+            RecipePopularity.objects.all().delete()
+            RecipePopularity.objects.bulk_create(
+                RecipePopularity(recipe_id=row["recipe"], score=row["score"])
+                for row in scores.iterator()
+            )
+        recipe_cache.bump()
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Популярность пересчитана: рецептов "
+                f"{RecipePopularity.objects.count()}."
+            )
+        )
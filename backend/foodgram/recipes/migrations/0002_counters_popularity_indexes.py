@@ -0,0 +1,128 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:08
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+import django.db.models.deletion
+import recipes.models
+
+
+def get_duplicates(model, fields, **aggregates):
+    return (
+        model.objects.order_by()
+        .values(*fields)
+        .annotate(first=Min('id'), rows=Count('id'), **aggregates)
+        .filter(rows__gt=1)
+    )
+
+
+def dedupe_relations(apps, schema_editor):
+    """Сливает повторы перед добавлением уникальных ограничений."""
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    TagRecipe = apps.get_model('recipes', 'TagRecipe')
+    for row in get_duplicates(
+        IngredientRecipe, ('recipe', 'ingredient'), total=Sum('amount')
+    ):
+        duplicates = IngredientRecipe.objects.filter(
+            recipe=row['recipe'], ingredient=row['ingredient']
+        )
+        duplicates.exclude(id=row['first']).delete()
+        duplicates.update(
+            amount=min(row['total'], settings.INGREDIENT_UPPER_LIMIT)
+        )
+    for row in get_duplicates(TagRecipe, ('recipe', 'tag')):
+        TagRecipe.objects.filter(
+            recipe=row['recipe'], tag=row['tag']
+        ).exclude(id=row['first']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipePopularity',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='recipes.Recipe', verbose_name='Рецепт')),
+                ('score', models.PositiveIntegerField(db_index=True, verbose_name='Популярность')),
+            ],
+            options={
+                'verbose_name': 'Популярность рецепта',
+                'verbose_name_plural': 'Популярность рецептов',
+            },
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество рецептов'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_processed',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Уменьшенные копии картинки готовы'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_cart_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(upload_to=recipes.models.get_image_upload_path, verbose_name='Картинка'),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['user', '-added'], name='favorite_user_added_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', '-id'], name='recipe_pub_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['cooking_time'], name='recipe_cooking_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['name'], name='recipe_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count'], name='recipe_favorites_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(fields=['user', '-added'], name='shoppingcart_user_added_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tagrecipe',
+            index=models.Index(fields=['tag', 'recipe'], name='tagrecipe_tag_recipe_idx'),
+        ),
+        migrations.RunPython(dedupe_relations, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredientrecipe',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='unique_recipe_ingredient'),
+        ),
+        migrations.AddConstraint(
+            model_name='tagrecipe',
+            constraint=models.UniqueConstraint(fields=('recipe', 'tag'), name='unique_recipe_tag'),
+        ),
+    ]
@@ -1,9 +1,21 @@
+import hashlib
+import os
+
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 
 
+def get_image_upload_path(instance, filename):
+    """Имя по хэшу содержимого: файл можно кэшировать навсегда."""
+    digest = hashlib.sha256()
+    for chunk in instance.image.chunks():
+        digest.update(chunk)
+    extension = os.path.splitext(filename)[1].lower()
+    return f"recipes/images/{digest.hexdigest()}{extension}"
+
+
 class CustomUser(AbstractUser):
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = [
@@ -13,6 +25,12 @@ class CustomUser(AbstractUser):
         "email address",
         unique=True,
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name="Количество рецептов", default=0, editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name="Количество подписчиков", default=0, editable=False
+    )
 
     class Meta:
         verbose_name = "Пользователь"
@@ -63,7 +81,12 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField("Дата публикации", auto_now_add=True)
     name = models.CharField(verbose_name="Название", max_length=200)
     image = models.ImageField(
-        verbose_name="Картинка", upload_to="recipes/images/"
+        verbose_name="Картинка", upload_to=get_image_upload_path
+    )
+    image_processed = models.BooleanField(
+        verbose_name="Уменьшенные копии картинки готовы",
+        default=False,
+        editable=False,
     )
     text = models.TextField(
         verbose_name="Описание", help_text="Описание рецепта"
@@ -99,20 +122,71 @@ class Recipe(models.Model):
         ),
         verbose_name="Время приготовления",
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name="В избранном", default=0, editable=False
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name="В списках покупок", default=0, editable=False
+    )
 
     class Meta:
         ordering = ("-pub_date",)
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
+        indexes = (
+            models.Index(
+                fields=("-pub_date", "-id"), name="recipe_pub_date_id_idx"
+            ),
+            models.Index(fields=("cooking_time",), name="recipe_cooking_idx"),
+            models.Index(fields=("name",), name="recipe_name_idx"),
+            models.Index(
+                fields=("-favorites_count",), name="recipe_favorites_idx"
+            ),
+            models.Index(
+                fields=("author", "-pub_date"),
+                name="recipe_author_pub_date_idx",
+            ),
+        )
 
     def __str__(self):
         return self.name
 
 
+class RecipePopularity(models.Model):
+    """Избранное за POPULARITY_DAYS дней; см. refresh_popularity."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="popularity",
+        verbose_name="Рецепт",
+    )
+    score = models.PositiveIntegerField(
+        verbose_name="Популярность", db_index=True
+    )
+
+    class Meta:
+        verbose_name = "Популярность рецепта"
+        verbose_name_plural = "Популярность рецептов"
+
+
 class TagRecipe(models.Model):
     tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=("tag", "recipe"), name="tagrecipe_tag_recipe_idx"
+            ),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=("recipe", "tag"), name="unique_recipe_tag"
+            ),
+        )
+
 
 class IngredientRecipe(models.Model):
     ingredient = models.ForeignKey(
@@ -141,6 +215,12 @@ class IngredientRecipe(models.Model):
 
     class Meta:
         verbose_name = "Ингредиент для рецепта"
+        constraints = (
+            models.UniqueConstraint(
+                fields=("recipe", "ingredient"),
+                name="unique_recipe_ingredient",
+            ),
+        )
 
 
 class Subscription(models.Model):
@@ -192,6 +272,11 @@ class Favorite(models.Model):
     class Meta:
         verbose_name = "Рецепт в избранном"
         verbose_name_plural = "Рецепты в избранном"
+        indexes = (
+            models.Index(
+                fields=("user", "-added"), name="favorite_user_added_idx"
+            ),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=("user", "recipe"), name="unique_favorite_recipe"
@@ -223,6 +308,11 @@ class ShoppingCart(models.Model):
     class Meta:
         verbose_name = "Рецепт в списке покупок"
         verbose_name_plural = "Рецепты в списке покупок"
+        indexes = (
+            models.Index(
+                fields=("user", "-added"), name="shoppingcart_user_added_idx"
+            ),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=("user", "recipe"), name="unique_shopping_list_recipe"
@@ -0,0 +1,181 @@
+"""Полнотекстовый поиск: tsvector в PostgreSQL, FTS5 в SQLite."""
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+
+from .models import Ingredient, IngredientRecipe, Recipe
+
+TABLE = "recipes_recipe_search"
+WORD = re.compile(r"\w+")
+
+POSTGRESQL_SETUP = (
+    f"""
+    CREATE TABLE IF NOT EXISTS {TABLE} (
+        recipe_id bigint PRIMARY KEY
+            REFERENCES recipes_recipe (id) ON DELETE CASCADE,
+        document tsvector NOT NULL
+    )
+    """,
+    f"""
+    CREATE INDEX IF NOT EXISTS {TABLE}_document_idx
+        ON {TABLE} USING gin (document)
+    """,
+)
+SQLITE_SETUP = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE}
+        USING fts5(name, text, ingredients, tokenize='unicode61')
+    """,
+)
+
+POSTGRESQL_UPDATE = f"""
+    INSERT INTO {TABLE} (recipe_id, document)
+    SELECT recipe.id,
+        setweight(to_tsvector(%(config)s, recipe.name), 'A')
+        || setweight(to_tsvector(%(config)s, recipe.text), 'B')
+        || setweight(to_tsvector(%(config)s, coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM recipes_ingredientrecipe line
+            JOIN recipes_ingredient ingredient
+                ON ingredient.id = line.ingredient_id
+            WHERE line.recipe_id = recipe.id
+        ), '')), 'C')
+    FROM recipes_recipe recipe
+    WHERE recipe.id IN %(ids)s
+    ON CONFLICT (recipe_id) DO UPDATE SET document = EXCLUDED.document
+"""
+SQLITE_DELETE = f"DELETE FROM {TABLE} WHERE rowid IN (%s)"
+SQLITE_UPDATE = f"""
+    INSERT INTO {TABLE} (rowid, name, text, ingredients)
+    SELECT recipe.id, recipe.name, recipe.text, coalesce((
+        SELECT group_concat(ingredient.name, ' ')
+        FROM recipes_ingredientrecipe line
+        JOIN recipes_ingredient ingredient
+            ON ingredient.id = line.ingredient_id
+        WHERE line.recipe_id = recipe.id
+    ), '')
+    FROM recipes_recipe recipe
+    WHERE recipe.id IN (%s)
+"""
+
+
+class SearchRank(RawSQL):
+    """Оценка релевантности, не попадающая в GROUP BY.
+
+    Django добавляет RawSQL-аннотации в группировку подзапроса count(),
+    а группировка по подзапросу с MATCH ломает подсчёт в SQLite.
+    """
+
+    def get_group_by_cols(self, alias=None):
+        return []
+
+
+class MatchedIds(RawSQL):
+    """Подзапрос с id найденных рецептов для фильтра id__in.
+
+    Лукап сам заключает подзапрос в скобки; со скобками RawSQL
+    получилось бы IN ((...)), и база взяла бы только первую строку.
+    """
+
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+def create_search_table(**kwargs):
+    setup = {"postgresql": POSTGRESQL_SETUP, "sqlite": SQLITE_SETUP}
+    with connection.cursor() as cursor:
+        for statement in setup.get(connection.vendor, ()):
+            cursor.execute(statement)
+
+
+def update_documents(ids):
+    """Пересобирает поисковые документы рецептов с указанными id."""
+    ids = tuple(ids)
+    if not ids:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                POSTGRESQL_UPDATE,
+                {"config": settings.SEARCH_CONFIG, "ids": ids},
+            )
+        elif connection.vendor == "sqlite":
+            placeholders = ", ".join(["%s"] * len(ids))
+            cursor.execute(SQLITE_DELETE % placeholders, ids)
+            cursor.execute(SQLITE_UPDATE % placeholders, ids)
+
+
+def delete_document(recipe_id):
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(SQLITE_DELETE % "%s", (recipe_id,))
+
+
+def get_fts5_query(query):
+    return " ".join(f'"{word}"*' for word in WORD.findall(query))
+
+
+def search(queryset, query):
+    """Отбирает рецепты по запросу и сортирует их по релевантности."""
+    if connection.vendor == "postgresql":
+        tsquery = "plainto_tsquery(%s, %s)"
+        params = (settings.SEARCH_CONFIG, query)
+        return queryset.filter(
+            id__in=MatchedIds(
+                f"SELECT recipe_id FROM {TABLE} "
+                f"WHERE document @@ {tsquery}",
+                params,
+            )
+        ).annotate(
+            search_rank=SearchRank(
+                f"SELECT ts_rank(document, {tsquery}) FROM {TABLE} "
+                f"WHERE recipe_id = {Recipe._meta.db_table}.id",
+                params,
+            )
+        ).order_by("-search_rank", "-pub_date", "-id")
+    if connection.vendor == "sqlite":
+        match = get_fts5_query(query)
+        if not match:
+            return queryset
+        return queryset.filter(
+            id__in=MatchedIds(
+                f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s", (match,)
+            )
+        ).annotate(
+            search_rank=SearchRank(
+                f"SELECT bm25({TABLE}, 10.0, 2.0, 1.0) FROM {TABLE} "
+                f"WHERE {TABLE} MATCH %s "
+                f"AND rowid = {Recipe._meta.db_table}.id",
+                (match,),
+            )
+        ).order_by("search_rank", "-pub_date", "-id")
+    return queryset.filter(
+        Q(name__icontains=query) | Q(text__icontains=query)
+    )
+
+
+def recipe_saved(instance, **kwargs):
+    transaction.on_commit(lambda: update_documents((instance.id,)))
+
+
+def recipe_deleted(instance, **kwargs):
+    delete_document(instance.id)
+
+
+def ingredient_saved(instance, created, **kwargs):
+    if created:
+        return
+    ids = IngredientRecipe.objects.filter(ingredient=instance).values_list(
+        "recipe_id", flat=True
+    )
+    transaction.on_commit(lambda: update_documents(set(ids)))
+
+
+def connect_signals():
+    post_save.connect(recipe_saved, sender=Recipe)
+    post_delete.connect(recipe_deleted, sender=Recipe)
+    post_save.connect(ingredient_saved, sender=Ingredient)